@@ -1,24 +1,53 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse, JSONResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+from gridfs.errors import NoFile
 import os
 import logging
 import asyncio
+import heapq
 import json
+import math
 import uuid
 import base64
+import email.utils
+import gzip
+import hashlib
+import hmac
+import html
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
 import zipfile
-import io
 import aiofiles
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone, timedelta
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable, Set, Deque, AsyncIterator
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-import requests
+import httpx
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
+try:
+    import google.generativeai as genai
+except ImportError:  # token streaming falls back to whole responses
+    genai = None
+
+try:
+    import brotli
+except ImportError:  # previews are served with gzip only
+    brotli = None
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -28,6 +57,21 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+async def ensure_ttl_index(collection, field: str, seconds: int, name: str, partial: Optional[dict] = None):
+    """Create, retune or (seconds <= 0) drop a TTL index - changing the TTL never needs a manual migration"""
+    existing = await collection.index_information()
+    if seconds <= 0:
+        if name in existing:
+            await collection.drop_index(name)
+        return
+    options = {"partialFilterExpression": partial} if partial else {}
+    try:
+        await collection.create_index(field, name=name, expireAfterSeconds=seconds, **options)
+    except OperationFailure as e:
+        if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        await collection.database.command("collMod", collection.name, index={"name": name, "expireAfterSeconds": seconds})
+
 # Create the main app and router
 app = FastAPI(title="FlowForge API", version="3.0.0")
 api_router = APIRouter(prefix="/api")
@@ -135,6 +179,98 @@ AGENTS = [
     {"id": "agent_088", "name": "Production Optimization Specialist", "phase": "deployment", "specialization": "Live site optimization and maintenance", "duration": 550}
 ]
 
+# Generation phases in pipeline order
+PHASES = ["analysis", "design", "frontend", "backend", "testing", "deployment"]
+
+# Agent dependency graph - an agent starts as soon as the agents it depends on are complete.
+# Agents without an entry have no inputs and are ready immediately.
+AGENT_DEPENDENCIES = {
+    # Analysis
+    "agent_007": ["agent_001", "agent_003"],
+    "agent_010": ["agent_009"],
+    "agent_011": ["agent_001"],
+    "agent_022": ["agent_008"],
+
+    # Design
+    "agent_023": ["agent_004"],
+    "agent_024": ["agent_004"],
+    "agent_025": ["agent_005", "agent_006"],
+    "agent_026": ["agent_025"],
+    "agent_027": ["agent_023", "agent_024", "agent_044"],
+    "agent_028": ["agent_005"],
+    "agent_029": ["agent_004"],
+    "agent_030": ["agent_025", "agent_014"],
+    "agent_031": ["agent_026"],
+    "agent_032": ["agent_004"],
+    "agent_033": ["agent_025"],
+    "agent_034": ["agent_006"],
+    "agent_035": ["agent_018"],
+    "agent_036": ["agent_014"],
+    "agent_037": ["agent_023"],
+    "agent_038": ["agent_026"],
+    "agent_039": ["agent_026"],
+    "agent_040": ["agent_011"],
+    "agent_041": ["agent_006"],
+    "agent_042": ["agent_007", "agent_011"],
+    "agent_043": ["agent_005", "agent_007"],
+    "agent_044": ["agent_004"],
+
+    # Frontend
+    "agent_045": ["agent_026"],
+    "agent_046": ["agent_023", "agent_024", "agent_033"],
+    "agent_047": ["agent_031"],
+    "agent_048": ["agent_030", "agent_036"],
+    "agent_049": ["agent_015"],
+    "agent_050": ["agent_035"],
+    "agent_051": ["agent_013"],
+    "agent_052": ["agent_040"],
+    "agent_053": ["agent_045"],
+    "agent_054": ["agent_012"],
+    "agent_055": ["agent_041"],
+    "agent_056": ["agent_032"],
+    "agent_057": ["agent_038"],
+    "agent_058": ["agent_012"],
+    "agent_059": ["agent_016"],
+    "agent_060": ["agent_039"],
+    "agent_061": ["agent_021"],
+    "agent_062": ["agent_014"],
+    "agent_063": ["agent_017"],
+    "agent_064": ["agent_019"],
+    "agent_065": ["agent_049"],
+    "agent_066": ["agent_065"],
+
+    # Backend
+    "agent_067": ["agent_012", "agent_054"],
+    "agent_068": ["agent_001", "agent_020"],
+    "agent_069": ["agent_016", "agent_067"],
+    "agent_070": ["agent_059"],
+    "agent_071": ["agent_015", "agent_068"],
+    "agent_072": ["agent_067"],
+    "agent_073": ["agent_067"],
+    "agent_074": ["agent_052"],
+    "agent_075": ["agent_056"],
+    "agent_076": ["agent_019"],
+    "agent_077": ["agent_022"],
+
+    # Testing
+    "agent_078": ["agent_069", "agent_070"],
+    "agent_079": ["agent_049", "agent_071"],
+    "agent_080": ["agent_058"],
+    "agent_081": ["agent_050"],
+    "agent_082": ["agent_051"],
+    "agent_083": ["agent_048"],
+
+    # Deployment
+    "agent_084": ["agent_065"],
+    "agent_085": ["agent_084", "agent_061"],
+    "agent_086": ["agent_084"],
+    "agent_087": ["agent_063", "agent_079"],
+    "agent_088": ["agent_082", "agent_087"],
+}
+
+# Maximum number of agents running at once per project
+AGENT_CONCURRENCY = int(os.environ.get('AGENT_CONCURRENCY', '8'))
+
 # Pydantic models
 class GenerateWebsiteRequest(BaseModel):
     prompt: str
@@ -142,6 +278,8 @@ class GenerateWebsiteRequest(BaseModel):
     target_audience: Optional[str] = None
     style_preferences: Optional[Dict[str, Any]] = None
     include_auth: Optional[bool] = False
+    bypass_cache: Optional[bool] = False
+    priority: Optional[str] = "free"  # "paid" requires an X-Api-Key listed in PAID_API_KEYS
 
 class AgentStatus(BaseModel):
     id: str
@@ -165,73 +303,1346 @@ class ProjectStatus(BaseModel):
     deployment_url: Optional[str] = None
     github_repo: Optional[str] = None
     preview_html: Optional[str] = None
+    file_manifest: Optional[Dict[str, str]] = None  # path -> blob hash
+    preview_hash: Optional[str] = None
+    preview_encodings: Optional[Dict[str, str]] = None  # Content-Encoding -> blob hash
+
+# Timing instrumentation
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)  # seconds
+TIMELINE_PROJECTS = int(os.environ.get('TIMELINE_PROJECTS', '256'))  # projects whose timelines stay in memory
+TIMELINE_MAX_SPANS = int(os.environ.get('TIMELINE_MAX_SPANS', '1000'))  # per project
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = SPAN_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+class SpanMetrics:
+    """Span durations by name and labels, rendered as one Prometheus histogram family"""
+    def __init__(self):
+        self.histograms: Dict[Tuple[Tuple[str, str], ...], Histogram] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (("span", name), *sorted((label, str(value)) for label, value in labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP flowforge_span_seconds Time spent in each instrumented stage",
+            "# TYPE flowforge_span_seconds histogram"
+        ]
+        for key, histogram in sorted(self.histograms.items()):
+            labels = ",".join(f'{label}="{value}"' for label, value in key)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'flowforge_span_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'flowforge_span_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"flowforge_span_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"flowforge_span_seconds_count{{{labels}}} {histogram.count}")
+        return lines
+
+span_metrics = SpanMetrics()
+
+class ProjectTimelines:
+    """Compact per-project span lists, offsets relative to the project's first span"""
+    def __init__(self, max_projects: int = TIMELINE_PROJECTS, max_spans: int = TIMELINE_MAX_SPANS):
+        self.max_projects = max_projects
+        self.max_spans = max_spans
+        self._timelines: "OrderedDict[str, dict]" = OrderedDict()
+
+    def record(self, project_id: str, name: str, started: float, seconds: float, **fields):
+        timeline = self._timelines.get(project_id)
+        if timeline is None:
+            timeline = self._timelines[project_id] = {"origin": started, "spans": [], "dropped": 0}
+            while len(self._timelines) > self.max_projects:
+                self._timelines.popitem(last=False)
+        if len(timeline["spans"]) >= self.max_spans:
+            timeline["dropped"] += 1
+            return
+        timeline["spans"].append({
+            "span": name,
+            "start_ms": round((started - timeline["origin"]) * 1000, 1),
+            "duration_ms": round(seconds * 1000, 1),
+            **fields
+        })
+
+    def get(self, project_id: str) -> Optional[dict]:
+        timeline = self._timelines.get(project_id)
+        if timeline is None:
+            return None
+        return {"spans": list(timeline["spans"]), "dropped": timeline["dropped"]}
+
+project_timelines = ProjectTimelines()
+
+def record_span(name: str, started: float, project_id: Optional[str] = None, agent: Optional[str] = None, **labels):
+    """Record a span that began at perf_counter() value started and ends now.
+    
+    labels become histogram labels and must be low-cardinality; agent only goes to the project timeline.
+    """
+    seconds = time.perf_counter() - started
+    span_metrics.observe(name, seconds, **labels)
+    if project_id is not None:
+        fields = {**labels, "agent": agent} if agent else labels
+        project_timelines.record(project_id, name, started, seconds, **fields)
+
+@contextmanager
+def span(name: str, project_id: Optional[str] = None, agent: Optional[str] = None, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, started, project_id, agent, **labels)
+
+# Event-loop diagnostics
+DIAGNOSTICS = os.environ.get('DIAGNOSTICS', 'false').lower() == 'true'
+LOOP_LAG_INTERVAL = float(os.environ.get('LOOP_LAG_INTERVAL', '0.05'))  # seconds between heartbeats
+BLOCKING_THRESHOLD = float(os.environ.get('BLOCKING_THRESHOLD', '0.1'))  # seconds the loop may be held before a stack is captured
+LOOP_LAG_SAMPLES = 4096
+BLOCKING_STACK_DEPTH = 15
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')  # admin endpoints are disabled until this is set
+
+def blocking_call_site(frame) -> Tuple[str, List[str]]:
+    """Call site to blame for a stall - the innermost frame in our own code - and the formatted stack"""
+    stack = traceback.extract_stack(frame)[-BLOCKING_STACK_DEPTH:]
+    site = stack[-1]
+    for entry in reversed(stack):
+        if Path(entry.filename).parent == ROOT_DIR:
+            site = entry
+            break
+    return f"{Path(site.filename).name}:{site.lineno} in {site.name}", traceback.format_list(stack)
+
+class EventLoopMonitor:
+    """Samples event-loop lag and captures the loop thread's stack whenever a callback holds it too long.
+
+    A heartbeat task records how late each tick fires; a watchdog thread notices when the heartbeat
+    stops and snapshots what the loop is running at that moment, aggregated by call site.
+    """
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = BLOCKING_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=LOOP_LAG_SAMPLES)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.sites: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._last_tick = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._watchdog.join)
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._last_tick = time.monotonic()
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            span_metrics.observe("event_loop_lag", lag)
+
+    def _watch(self):
+        stalled_at = None
+        site, stack = None, None
+        while not self._stopped.wait(self.threshold / 4):
+            last_tick = self._last_tick
+            behind = time.monotonic() - last_tick - self.interval
+            if stalled_at is None and behind > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+                stalled_at = last_tick
+                site, stack = blocking_call_site(frame)
+                del frame
+            elif stalled_at is not None and last_tick != stalled_at:
+                # The heartbeat fired again - the stall lasted until roughly now
+                self._record(site, stack, last_tick - stalled_at - self.interval)
+                stalled_at = None
+
+    def _record(self, site: str, stack: List[str], seconds: float):
+        with self._lock:
+            self.stalls += 1
+            entry = self.sites.get(site)
+            first_seen = entry is None
+            if first_seen:
+                entry = self.sites[site] = {"site": site, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "stack": stack}
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+            if seconds * 1000 > entry["max_ms"]:
+                entry["max_ms"] = seconds * 1000
+                entry["stack"] = stack
+        if first_seen:
+            logging.warning(f"Event loop blocked for {seconds * 1000:.0f}ms at {site}:\n{''.join(stack)}")
+        else:
+            logging.warning(f"Event loop blocked for {seconds * 1000:.0f}ms at {site} ({entry['count']} times)")
+
+    def report(self, top: int = 10) -> dict:
+        lags = sorted(self.lags)
+
+        def at(fraction: float) -> Optional[float]:
+            return round(lags[min(len(lags) - 1, int(fraction * len(lags)))] * 1000, 2) if lags else None
+
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda entry: entry["total_ms"], reverse=True)[:top]
+            offenders = [{**entry, "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1)} for entry in sites]
+        return {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {"samples": len(lags), "p50": at(0.50), "p99": at(0.99), "max": round(self.max_lag * 1000, 2)},
+            "stalls": self.stalls,
+            "call_sites": len(self.sites),
+            "top_offenders": offenders
+        }
+
+loop_monitor = EventLoopMonitor()
 
 # WebSocket connection manager
+WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', '256'))
+WS_SEND_TIMEOUT = float(os.environ.get('WS_SEND_TIMEOUT', '10'))  # seconds
+WS_HEARTBEAT_INTERVAL = float(os.environ.get('WS_HEARTBEAT_INTERVAL', '20'))  # seconds
+
+# Only the latest message of these types matters - a newer one replaces any still queued
+COALESCED_MESSAGE_TYPES = {"phase_update", "ping"}
+# Messages a slow subscriber may lose - everything else (preview chunks, completion) must arrive
+DROPPABLE_MESSAGE_TYPES = {"agent_update", "phase_update", "ping"}
+
+class Subscriber:
+    """A single WebSocket watching a project, fed from a bounded send queue by its own task"""
+    def __init__(self, websocket: WebSocket, project_id: str, on_close: Callable[["Subscriber"], None],
+                 queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.queue_size = queue_size
+        self.queue: Deque[dict] = deque()
+        self.dropped = 0
+        self.closed = False
+        self._on_close = on_close
+        self._ready = asyncio.Event()
+        # Live messages parked while missed events are replayed
+        self._held: Optional[List[dict]] = None
+        self._replay_task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+        self._task = asyncio.create_task(self._drain())
+
+    def replay_from(self, since: int):
+        """Send logged events after since, then switch to live messages without gaps or duplicates"""
+        self._held = []
+        self._replay_task = asyncio.create_task(self._replay(since))
+
+    async def _replay(self, since: int):
+        last_seq = since
+        try:
+            # The drain task is idle while messages are held, so sending directly keeps ordering
+            async for event in event_log.replay(self.project_id, since):
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), WS_SEND_TIMEOUT)
+                last_seq = event["seq"]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.info(f"Replay to subscriber for project {self.project_id} failed: {e}")
+            self.close()
+            return
+        
+        held, self._held = self._held, None
+        for message in held:
+            if message.get("seq", last_seq + 1) > last_seq:
+                self.offer(message)
+
+    def offer(self, message: dict):
+        """Queue a message without waiting - slow subscribers lose droppable messages or get disconnected"""
+        if self.closed:
+            return
+        if self._held is not None:
+            self._held.append(message)
+            return
+        
+        message_type = message.get("type")
+        if message_type in COALESCED_MESSAGE_TYPES:
+            self._remove_first(lambda queued: queued.get("type") == message_type)
+        
+        if len(self.queue) >= self.queue_size:
+            if not self._remove_first(lambda queued: queued.get("type") in DROPPABLE_MESSAGE_TYPES):
+                logging.warning(f"WebSocket subscriber for project {self.project_id} is too slow, disconnecting")
+                self.close()
+                return
+        
+        self.queue.append(message)
+        self._ready.set()
+
+    def _remove_first(self, predicate: Callable[[dict], bool]) -> bool:
+        for index, queued in enumerate(self.queue):
+            if predicate(queued):
+                del self.queue[index]
+                self.dropped += 1
+                return True
+        return False
+
+    async def _drain(self):
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), WS_HEARTBEAT_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # Idle connection - keep proxies from timing it out
+                        self.offer({"type": "ping", "timestamp": time.time()})
+                    continue
+                
+                message = self.queue.popleft()
+                with span("ws_send"):
+                    await asyncio.wait_for(self.websocket.send_text(json.dumps(message)), WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.info(f"WebSocket subscriber for project {self.project_id} closed: {e}")
+            await self._close_websocket()
+        finally:
+            self._mark_closed()
+
+    def _mark_closed(self):
+        if not self.closed:
+            self.closed = True
+            self._on_close(self)
+
+    def close(self):
+        self._mark_closed()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self._replay_task is not None and self._replay_task is not asyncio.current_task():
+            self._replay_task.cancel()
+        if self._close_task is None:
+            self._close_task = asyncio.create_task(self._close_websocket())
+
+    async def _close_websocket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, Set[Subscriber]] = {}
 
-    async def connect(self, websocket: WebSocket, project_id: str):
+    async def connect(self, websocket: WebSocket, project_id: str, since: Optional[int] = None) -> Subscriber:
         await websocket.accept()
-        self.active_connections[project_id] = websocket
+        subscriber = Subscriber(websocket, project_id, on_close=lambda closed: self.disconnect(project_id, closed))
+        # Subscribe before replaying so nothing published meanwhile is missed
+        self.active_connections.setdefault(project_id, set()).add(subscriber)
+        if since is not None:
+            subscriber.replay_from(since)
+        return subscriber
 
-    def disconnect(self, project_id: str):
-        if project_id in self.active_connections:
-            del self.active_connections[project_id]
+    def disconnect(self, project_id: str, subscriber: Subscriber):
+        subscribers = self.active_connections.get(project_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscriber.closed:
+            subscriber.close()
+        if not subscribers:
+            # close() may already have removed the project through on_close
+            self.active_connections.pop(project_id, None)
 
     async def send_update(self, project_id: str, data: dict):
-        if project_id in self.active_connections:
-            try:
-                await self.active_connections[project_id].send_text(json.dumps(data))
-            except:
-                self.disconnect(project_id)
+        # Log first so the event has a sequence number clients can resume from,
+        # then the event bus reaches subscribers connected to any worker.
+        # sent_at lets clients measure delivery lag.
+        with span("publish"):
+            event = await event_log.append(project_id, {**data, "sent_at": time.time()})
+            await event_bus.publish(project_id, event)
+
+    async def deliver(self, project_id: str, data: dict):
+        # Only enqueues - generation never waits on a client
+        for subscriber in list(self.active_connections.get(project_id, ())):
+            subscriber.offer(data)
 
 manager = ConnectionManager()
 
+# Resumable per-project event log
+EVENT_LOG_TTL = int(os.environ.get('EVENT_LOG_TTL', '86400'))  # seconds
+
+class EventLog:
+    """Sequence-numbered log of every project update so late or reconnecting clients can catch up.
+    
+    Only the worker holding a project's generation job appends to it, so sequence numbers are kept in process
+    and picked up from the log when another worker resumes the project.
+    """
+    def __init__(self, collection, ttl: int = EVENT_LOG_TTL):
+        self.collection = collection
+        self.ttl = ttl
+        self._seq: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("project_id", 1), ("seq", 1)], unique=True)
+        await ensure_ttl_index(self.collection, "created_at", self.ttl, "created_at_ttl")
+
+    async def append(self, project_id: str, data: dict) -> dict:
+        """Assign the next sequence number and persist the event - a failed write still returns the event"""
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            if project_id not in self._seq:
+                last = await self.collection.find_one({"project_id": project_id}, {"_id": 0, "seq": 1}, sort=[("seq", -1)])
+                self._seq[project_id] = last["seq"] if last else 0
+            self._seq[project_id] += 1
+            event = {**data, "seq": self._seq[project_id]}
+            try:
+                await self.collection.insert_one({
+                    "project_id": project_id,
+                    "seq": event["seq"],
+                    "event": event,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            except Exception as e:
+                logging.error(f"Failed to log event {event['seq']} for project {project_id}: {e}")
+        return event
+
+    async def replay(self, project_id: str, since: int) -> AsyncIterator[dict]:
+        cursor = self.collection.find({"project_id": project_id, "seq": {"$gt": since}}, {"_id": 0, "event": 1}).sort("seq", 1)
+        async for document in cursor:
+            yield document["event"]
+
+    def forget(self, project_id: str):
+        """Drop in-process sequence state once a project stops producing events"""
+        self._seq.pop(project_id, None)
+        self._locks.pop(project_id, None)
+
+event_log = EventLog(db.project_events)
+
+class SSEConnection:
+    """WebSocket-shaped adapter so Server-Sent Events clients reuse Subscriber queueing and backpressure"""
+    def __init__(self):
+        # A single slot - the subscriber queue holds the backlog, not this
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.closed = False
+        # Separate from the queue - a close must end the stream even while the slot is full
+        self._closed = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await self.messages.put(text)
+
+    async def close(self):
+        self.closed = True
+        self._closed.set()
+
+    async def receive(self) -> Optional[str]:
+        """Next message to stream, None once the connection is closed"""
+        if self.closed:
+            return None
+        message = asyncio.ensure_future(self.messages.get())
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            await asyncio.wait({message, closed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            message.cancel()
+            closed.cancel()
+        return message.result() if message.done() and not message.cancelled() else None
+
+def format_sse(message: dict) -> str:
+    lines = []
+    if "seq" in message:
+        lines.append(f"id: {message['seq']}")
+    lines.append(f"event: {message.get('type', 'message')}")
+    lines.append(f"data: {json.dumps(message)}")
+    return "\n".join(lines) + "\n\n"
+
+# Cross-worker event bus
+EVENT_BUS = os.environ.get('EVENT_BUS', 'local')  # local, mongo or socket
+EVENT_BUS_ADDRESS = os.environ.get('EVENT_BUS_ADDRESS', '127.0.0.1:8765')
+EVENT_BUS_CAPPED_SIZE = int(os.environ.get('EVENT_BUS_CAPPED_SIZE', str(64 * 1024 * 1024)))  # bytes
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class LocalEventBus:
+    """Single-process bus - events only reach subscribers connected to this worker"""
+    def __init__(self, deliver: Callable[[str, dict], Awaitable[None]]):
+        self.deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, project_id: str, data: dict):
+        await self.deliver(project_id, data)
+
+class MongoEventBus(LocalEventBus):
+    """Carries events between workers through a capped collection that every worker tails"""
+    def __init__(self, deliver: Callable[[str, dict], Awaitable[None]], collection_name: str = "event_bus",
+                 size: int = EVENT_BUS_CAPPED_SIZE):
+        super().__init__(deliver)
+        self.collection_name = collection_name
+        self.size = size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass  # already created by another worker
+        self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def publish(self, project_id: str, data: dict):
+        # Local subscribers are served directly, other workers pick the event up from the tail
+        await self.deliver(project_id, data)
+        try:
+            await db[self.collection_name].insert_one({
+                "origin": WORKER_ID,
+                "project_id": project_id,
+                "data": data,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            logging.error(f"Event bus publish failed for project {project_id}: {e}")
+
+    async def _tail(self):
+        collection = db[self.collection_name]
+        last = await collection.find_one(sort=[("$natural", -1)])
+        last_id = last["_id"] if last else None
+        
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for document in cursor:
+                        last_id = document["_id"]
+                        if document["origin"] != WORKER_ID:
+                            await self.deliver(document["project_id"], document["data"])
+                    await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Event bus tail failed: {e}")
+            # A tailable cursor on an empty collection dies immediately
+            await asyncio.sleep(1)
+
+class SocketEventBus(LocalEventBus):
+    """Relays events between workers on one host through a local TCP broker - a stand-in for tests and single-node setups.
+    
+    The first worker to bind EVENT_BUS_ADDRESS hosts the broker, every worker (including that one) connects to it.
+    """
+    def __init__(self, deliver: Callable[[str, dict], Awaitable[None]], address: str = EVENT_BUS_ADDRESS):
+        super().__init__(deliver)
+        host, port = address.rsplit(':', 1)
+        self.host = host
+        self.port = int(port)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self._host_broker()
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        for peer in list(self._peers):
+            peer.close()
+        if self._server is not None:
+            self._server.close()
+
+    async def publish(self, project_id: str, data: dict):
+        await self.deliver(project_id, data)
+        if self._writer is not None:
+            self._writer.write((json.dumps({"project_id": project_id, "data": data}) + "\n").encode())
+
+    async def _host_broker(self):
+        if self._server is not None:
+            return
+        try:
+            self._server = await asyncio.start_server(self._relay, self.host, self.port)
+        except OSError:
+            pass  # another worker is the broker
+
+    async def _relay(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Broker side - forward every line to all other connected workers"""
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for peer in list(self._peers):
+                    if peer is not writer:
+                        peer.write(line)
+        except ConnectionError:
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _listen(self):
+        """Worker side - deliver events relayed from other workers, reconnecting if the broker goes away"""
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    event = json.loads(line)
+                    await self.deliver(event["project_id"], event["data"])
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError) as e:
+                logging.warning(f"Event bus connection lost: {e}")
+            self._writer = None
+            # Take over as broker if the previous one has exited
+            await asyncio.sleep(random.uniform(0.5, 1.5))
+            await self._host_broker()
+
+EVENT_BUS_BACKENDS = {
+    "local": LocalEventBus,
+    "mongo": MongoEventBus,
+    "socket": SocketEventBus,
+}
+
+event_bus = EVENT_BUS_BACKENDS[EVENT_BUS](manager.deliver)
+
+# Versioned project updates
+async def update_project(project_id: str, fields: Dict[str, Any]):
+    """$set fields on a project and bump its version in one atomic write.
+    
+    Agents touched by the update are stamped with the new version so pollers can ask for changes since a version.
+    """
+    agent_ids = {key.split(".")[1] for key in fields if key.startswith("agents.")}
+    with span("mongo_write", collection="projects"):
+        await db.projects.update_one(
+            {"project_id": project_id},
+            [
+                {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}},
+                {"$set": {
+                    **{key: {"$literal": value} for key, value in fields.items()},
+                    **{f"agents.{agent_id}.version": "$version" for agent_id in agent_ids},
+                    "updated_at": {"$literal": datetime.now(timezone.utc)}
+                }}
+            ]
+        )
+
+# Content-addressed artifact storage
+BLOB_STORE = os.environ.get('BLOB_STORE', 'gridfs')  # gridfs | filesystem
+BLOB_STORE_PATH = Path(os.environ.get('BLOB_STORE_PATH', str(ROOT_DIR / 'blobs')))
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class GridFSBlobStore:
+    """Blobs in GridFS with the SHA-256 as the file id, so identical content is stored once"""
+    def __init__(self, database, bucket_name: str = "blobs"):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+        self.files = database[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes) -> str:
+        digest = blob_hash(data)
+        if await self.files.find_one({"_id": digest}, {"_id": 1}):
+            return digest
+        try:
+            await self.bucket.upload_from_stream_with_id(digest, digest, data)
+        except DuplicateKeyError:
+            pass  # stored concurrently by another generation
+        return digest
+
+    async def get(self, digest: str) -> bytes:
+        try:
+            stream = await self.bucket.open_download_stream(digest)
+        except NoFile:
+            raise KeyError(digest)
+        return await stream.read()
+
+class FileSystemBlobStore:
+    """Blobs as files under root/<first two hex chars>/<hash>, written atomically"""
+    def __init__(self, root: Path = BLOB_STORE_PATH):
+        self.root = root
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    async def put(self, data: bytes) -> str:
+        digest = blob_hash(data)
+        path = self._path(digest)
+        if path.exists():
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{digest}.{uuid.uuid4().hex}.tmp")
+        async with aiofiles.open(temp_path, 'wb') as f:
+            await f.write(data)
+        os.replace(temp_path, path)
+        return digest
+
+    async def get(self, digest: str) -> bytes:
+        try:
+            async with aiofiles.open(self._path(digest), 'rb') as f:
+                return await f.read()
+        except FileNotFoundError:
+            raise KeyError(digest)
+
+BLOB_STORE_BACKENDS = {
+    "gridfs": lambda: GridFSBlobStore(db),
+    "filesystem": lambda: FileSystemBlobStore(),
+}
+
+blob_store = BLOB_STORE_BACKENDS[BLOB_STORE]()
+
+async def store_generated_files(files: Dict[str, str]) -> Dict[str, str]:
+    """Store each file once by content and return the path -> hash manifest kept on the project"""
+    paths = list(files)
+    digests = await asyncio.gather(*(blob_store.put(files[path].encode()) for path in paths))
+    return dict(zip(paths, digests))
+
+async def load_generated_files(manifest: Dict[str, str]) -> Dict[str, str]:
+    paths = list(manifest)
+    contents = await asyncio.gather(*(blob_store.get(manifest[path]) for path in paths))
+    return {path: content.decode() for path, content in zip(paths, contents)}
+
+async def project_generated_files(project: dict) -> Optional[Dict[str, str]]:
+    """Generated files of a project, also for projects saved before artifacts moved to the blob store"""
+    if project.get("file_manifest"):
+        return await load_generated_files(project["file_manifest"])
+    return project.get("generated_files")
+
+async def project_preview_html(project: dict) -> Optional[str]:
+    if project.get("preview_hash"):
+        return (await blob_store.get(project["preview_hash"])).decode()
+    return project.get("preview_html")
+
+# Write-behind buffer for project status updates
+AGENT_STATUS_FLUSH_INTERVAL = float(os.environ.get('AGENT_STATUS_FLUSH_INTERVAL', '0.5'))  # seconds
+
+# Process-wide counters - "updates" requested vs. "writes" actually sent to Mongo
+write_buffer_stats = {"updates": 0, "writes": 0, "failed_writes": 0}
+
+class ProjectWriteBuffer:
+    """Coalesces status changes for one project into a single $set every flush interval"""
+    def __init__(self, project_id: str, interval: float = AGENT_STATUS_FLUSH_INTERVAL):
+        self.project_id = project_id
+        self.interval = interval
+        self.updates = 0
+        self.writes = 0
+        self._pending: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    def set(self, fields: Dict[str, Any]):
+        """Queue fields for the next flush - later values for the same field win"""
+        self._pending.update(fields)
+        self.updates += 1
+        write_buffer_stats["updates"] += 1
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Status flush failed for project {self.project_id}: {e}")
+            if self._pending:
+                self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            fields, self._pending = self._pending, {}
+            try:
+                await update_project(self.project_id, fields)
+            except Exception:
+                # Keep the fields for the next attempt without clobbering newer values
+                self._pending = {**fields, **self._pending}
+                write_buffer_stats["failed_writes"] += 1
+                raise
+            self.writes += 1
+            write_buffer_stats["writes"] += 1
+
+    async def close(self):
+        """Flush everything outstanding and stop the flush timer"""
+        if self._timer is not None and not self._timer.done() and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        await self.flush()
+        logging.info(f"Project {self.project_id}: coalesced {self.updates} status updates into {self.writes} writes")
+
+    def discard(self):
+        """Stop the flush timer and drop whatever is outstanding"""
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._pending = {}
+
+write_buffers: Dict[str, ProjectWriteBuffer] = {}
+
+def get_write_buffer(project_id: str) -> ProjectWriteBuffer:
+    if project_id not in write_buffers:
+        write_buffers[project_id] = ProjectWriteBuffer(project_id)
+    return write_buffers[project_id]
+
+async def close_write_buffer(project_id: str):
+    write_buffer = write_buffers.pop(project_id, None)
+    if write_buffer is not None:
+        await write_buffer.close()
+
+def discard_write_buffer(project_id: str):
+    write_buffer = write_buffers.pop(project_id, None)
+    if write_buffer is not None:
+        write_buffer.discard()
+
 # AI Chat initialization
+LLM_PROVIDER = "gemini"
+LLM_MODEL = "gemini-2.0-flash"
+
 def get_ai_chat(session_id: str, system_message: str):
     api_key = os.environ.get('EMERGENT_LLM_KEY')
     chat = LlmChat(
         api_key=api_key,
         session_id=session_id,
         system_message=system_message
-    ).with_model("gemini", "gemini-2.0-flash")
+    ).with_model(LLM_PROVIDER, LLM_MODEL)
     return chat
 
-# ULTRA-FAST Website generation functions
-async def run_agent_phase(project_id: str, phase: str, prompt: str, project_data: dict):
-    """Run a specific phase of agents in TURBO MODE"""
-    phase_agents = [agent for agent in AGENTS if agent["phase"] == phase]
+# LLM response cache
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', '86400'))  # seconds
+
+class LLMResponseCache:
+    """Two-tier LLM response cache - an in-process LRU in front of a Mongo collection"""
+    def __init__(self, collection, max_size: int = LLM_CACHE_SIZE, ttl: int = LLM_CACHE_TTL):
+        self.collection = collection
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "bypassed": 0}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("key", unique=True)
+        # Mongo removes entries once expires_at has passed
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    @staticmethod
+    def make_key(model: str, system_message: str, prompt: str) -> str:
+        """Content address for a request - prompts differing only in case or whitespace share a key"""
+        normalized_prompt = " ".join(prompt.split()).casefold()
+        return hashlib.sha256("\x00".join([model, system_message, normalized_prompt]).encode()).hexdigest()
+
+    def _remember(self, key: str, expires_at: float, response: str):
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return response
+            del self._entries[key]
+        
+        try:
+            document = await self.collection.find_one(
+                {"key": key, "expires_at": {"$gt": datetime.fromtimestamp(now, timezone.utc)}},
+                {"_id": 0, "response": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+            document = None
+        
+        if document is None:
+            self.stats["misses"] += 1
+            return None
+        
+        expires_at = document["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self._remember(key, expires_at.timestamp(), document["response"])
+        self.stats["mongo_hits"] += 1
+        return document["response"]
+
+    async def set(self, key: str, model: str, response: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, response)
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "model": model,
+                    "response": response,
+                    "created_at": datetime.now(timezone.utc),
+                    "expires_at": datetime.fromtimestamp(expires_at, timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logging.warning(f"LLM cache write failed: {e}")
+
+llm_cache = LLMResponseCache(db.llm_cache)
+
+# LLM concurrency governor
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '32'))
+LLM_MIN_CONCURRENCY = int(os.environ.get('LLM_MIN_CONCURRENCY', '2'))
+LLM_REQUESTS_PER_SECOND = float(os.environ.get('LLM_REQUESTS_PER_SECOND', '10'))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', '1000000'))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.environ.get('LLM_EXPECTED_OUTPUT_TOKENS', '512'))
+LLM_RATE_LIMIT_RETRIES = int(os.environ.get('LLM_RATE_LIMIT_RETRIES', '3'))
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count - about four characters per token"""
+    return len(text) // 4 + 1
+
+def is_rate_limit_error(error: Exception) -> bool:
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "rate limit", "ratelimit", "quota", "resource_exhausted", "too many requests"))
+
+class TokenBucket:
+    """Refilling token bucket - acquire waits until the requested amount is available"""
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters first-come first-served
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Correct an earlier estimate - positive amounts consume more, negative amounts refund"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class LLMGovernor:
+    """Process-wide limiter for LLM calls - request and token buckets plus AIMD adaptive concurrency"""
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 requests_per_second: float = LLM_REQUESTS_PER_SECOND, tokens_per_minute: float = LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second))
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+        self.stats = {
+            "requests": 0,
+            "rate_limited": 0,
+            "errors": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0
+        }
+
+    async def call(self, send: Callable[[], Awaitable[str]], estimated_tokens: int) -> str:
+        """Run send() once capacity is available, retrying with a smaller window when the provider returns 429"""
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await self._acquire(estimated_tokens)
+            try:
+                response = await send()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    self.stats["errors"] += 1
+                    raise
+                self.stats["rate_limited"] += 1
+                self._decrease()
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise
+                await asyncio.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+            finally:
+                await self._release()
+            
+            self._increase()
+            self.tokens.adjust(estimate_tokens(response) - LLM_EXPECTED_OUTPUT_TOKENS)
+            return response
+
+    async def _acquire(self, estimated_tokens: int):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            async with self._condition:
+                await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+                self.in_flight += 1
+        finally:
+            self.waiting -= 1
+        
+        waited = time.monotonic() - started
+        self.stats["requests"] += 1
+        self.stats["queue_wait_seconds_total"] += waited
+        self.stats["queue_wait_seconds_max"] = max(self.stats["queue_wait_seconds_max"], waited)
+
+    async def _release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _increase(self):
+        # Additive increase - roughly one extra slot per window of successful calls
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def _decrease(self):
+        # Multiplicative decrease, at most once per second so one burst of 429s halves the window once
+        now = time.monotonic()
+        if now - self._last_decrease >= 1.0:
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            self._last_decrease = now
+
+llm_governor = LLMGovernor()
+
+# Retries, deadlines and hedging
+AGENT_DEADLINE = float(os.environ.get('AGENT_DEADLINE', '45'))  # seconds per agent LLM call, retries included
+LLM_MAX_ATTEMPTS = int(os.environ.get('LLM_MAX_ATTEMPTS', '3'))
+LLM_RETRY_BASE_DELAY = float(os.environ.get('LLM_RETRY_BASE_DELAY', '0.5'))
+LLM_RETRY_MAX_DELAY = float(os.environ.get('LLM_RETRY_MAX_DELAY', '8'))
+LLM_HEDGING = os.environ.get('LLM_HEDGING', 'true').lower() == 'true'
+LLM_HEDGE_DELAY = float(os.environ.get('LLM_HEDGE_DELAY', '8'))  # used until there are enough samples for a p95
+
+class LatencyTracker:
+    """Rolling window of hedgeable LLM call latencies used to pick the hedging delay"""
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+llm_latency = LatencyTracker()
+
+async def hedged_llm_call(send: Callable[[], Awaitable[str]], estimated_tokens: int, hedge_delay: Optional[float], stats: dict,
+                          latency: Optional[LatencyTracker] = None) -> str:
+    """Run send() through the governor, starting a duplicate if it has not answered within hedge_delay.
     
-    # Process multiple agents in parallel for SPEED
-    batch_size = 5 if phase in ['analysis', 'design'] else 3
+    Call latencies go to latency, if given.
+    """
+    first_sent = asyncio.Event()
     
-    for i in range(0, len(phase_agents), batch_size):
-        batch = phase_agents[i:i + batch_size]
+    async def attempt() -> str:
+        stats["attempts"] += 1
         
-        # Process batch in parallel
-        tasks = []
-        for agent in batch:
-            tasks.append(process_single_agent(project_id, agent, prompt, project_data))
+        async def timed_send() -> str:
+            first_sent.set()
+            sent_at = time.monotonic()
+            response = await send()
+            if latency is not None:
+                latency.record(time.monotonic() - sent_at)
+            return response
         
-        await asyncio.gather(*tasks)
+        return await llm_governor.call(timed_send, estimated_tokens)
+    
+    pending = {asyncio.create_task(attempt())}
+    try:
+        if hedge_delay is not None:
+            # The hedge timer starts once the first attempt has left the governor queue
+            sent = asyncio.create_task(first_sent.wait())
+            await asyncio.wait(pending | {sent}, return_when=asyncio.FIRST_COMPLETED)
+            sent.cancel()
+            if first_sent.is_set():
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    stats["hedged"] = True
+                    pending.add(asyncio.create_task(attempt()))
         
-        # Brief pause for visual effect
-        await asyncio.sleep(0.2)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
 
-async def process_single_agent(project_id: str, agent: dict, prompt: str, project_data: dict):
-    """Process a single agent with AI integration"""
+async def call_llm(send: Callable[[], Awaitable[str]], estimated_tokens: int, deadline: Optional[float] = None,
+                   hedge: bool = False, retryable: Callable[[], bool] = lambda: True, stats: Optional[dict] = None) -> str:
+    """Call the LLM with jittered exponential backoff between attempts, an overall deadline and optional hedging"""
+    stats = stats if stats is not None else {}
+    stats.update({"attempts": 0, "hedged": False})
+    started = time.monotonic()
+    try:
+        for retry in range(LLM_MAX_ATTEMPTS):
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"LLM call exceeded its {deadline:g}s deadline")
+            
+            hedge_delay = (llm_latency.percentile(0.95) or LLM_HEDGE_DELAY) if hedge and LLM_HEDGING else None
+            # Only hedgeable calls feed the window - long artifact calls would inflate the p95
+            latency = llm_latency if hedge else None
+            attempt_started = time.monotonic()
+            try:
+                return await asyncio.wait_for(hedged_llm_call(send, estimated_tokens, hedge_delay, stats, latency), remaining)
+            except Exception as e:
+                # asyncio.TimeoutError is the builtin TimeoutError - only wait_for expiring means the deadline
+                # passed, a timeout raised inside send() is retried like any other failure
+                if isinstance(e, asyncio.TimeoutError) and remaining is not None and time.monotonic() - attempt_started >= remaining:
+                    raise TimeoutError(f"LLM call exceeded its {deadline:g}s deadline") from e
+                delay = min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** retry) * random.uniform(0.5, 1.5)
+                out_of_time = deadline is not None and time.monotonic() - started + delay >= deadline
+                if retry == LLM_MAX_ATTEMPTS - 1 or out_of_time or not retryable():
+                    raise
+                logging.warning(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    finally:
+        stats["latency_ms"] = int((time.monotonic() - started) * 1000)
+
+async def send_ai_message(session_id: str, system_message: str, text: str, bypass_cache: bool = False,
+                          on_chunk: Optional[Callable[[str], Awaitable[None]]] = None, deadline: Optional[float] = None,
+                          hedge: bool = False, stats: Optional[dict] = None) -> str:
+    """Send a single-turn message, answering from the response cache when possible.
+    
+    When on_chunk is given the response is streamed token by token where the Gemini SDK is available,
+    otherwise on_chunk receives the whole response at once. Streamed calls are never hedged and are only
+    retried while nothing has been streamed. stats, when given, receives attempts, latency_ms and cached.
+    """
+    stats = stats if stats is not None else {}
+    model = f"{LLM_PROVIDER}/{LLM_MODEL}"
+    key = LLMResponseCache.make_key(model, system_message, text)
+    
+    if bypass_cache:
+        llm_cache.stats["bypassed"] += 1
+    else:
+        cached_response = await llm_cache.get(key)
+        if cached_response is not None:
+            stats.update({"attempts": 0, "hedged": False, "latency_ms": 0, "cached": True})
+            if on_chunk:
+                await on_chunk(cached_response)
+            return cached_response
+    
+    streaming = on_chunk is not None and LLM_STREAMING and genai is not None and bool(os.environ.get('GEMINI_API_KEY'))
+    streamed = False
+    
+    async def forward_chunk(delta: str):
+        nonlocal streamed
+        streamed = True
+        await on_chunk(delta)
+    
+    async def send() -> str:
+        if streaming:
+            return await stream_gemini_message(system_message, text, forward_chunk)
+        chat = get_ai_chat(session_id, system_message)
+        return await chat.send_message(UserMessage(text=text))
+    
+    stats["cached"] = False
+    with span("llm_request", streaming=streaming):
+        response = await call_llm(
+            send,
+            estimate_tokens(system_message + text) + LLM_EXPECTED_OUTPUT_TOKENS,
+            deadline=deadline,
+            hedge=hedge and not streaming,
+            retryable=lambda: not streamed,
+            stats=stats
+        )
+    if on_chunk and not streaming:
+        await on_chunk(response)
+    
+    await llm_cache.set(key, model, response)
+    return response
+
+# Token streaming
+LLM_STREAMING = os.environ.get('LLM_STREAMING', 'true').lower() == 'true'
+
+async def stream_gemini_message(system_message: str, text: str, on_chunk: Callable[[str], Awaitable[None]]) -> str:
+    """Stream a response from Gemini directly, passing each text delta to on_chunk"""
+    genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
+    model = genai.GenerativeModel(LLM_MODEL, system_instruction=system_message)
+    
+    parts = []
+    async for chunk in await model.generate_content_async(text, stream=True):
+        delta = chunk.text
+        if delta:
+            parts.append(delta)
+            await on_chunk(delta)
+    return "".join(parts)
+
+# Agent dependency graph
+def build_agent_graph(agents: List[dict], dependencies: Dict[str, List[str]]):
+    """Validate the declared dependencies and return (dependencies, dependents) maps"""
+    agent_ids = {agent["id"] for agent in agents}
+    deps = {agent_id: [] for agent_id in agent_ids}
+    dependents = {agent_id: [] for agent_id in agent_ids}
+    
+    for agent_id, parents in dependencies.items():
+        if agent_id not in agent_ids:
+            continue
+        for parent_id in parents:
+            # Dependencies outside the scheduled set are treated as already satisfied
+            if parent_id not in agent_ids:
+                continue
+            deps[agent_id].append(parent_id)
+            dependents[parent_id].append(agent_id)
+    
+    # Kahn's algorithm - every agent must be reachable, otherwise there is a cycle
+    remaining = {agent_id: len(parents) for agent_id, parents in deps.items()}
+    queue = [agent_id for agent_id, count in remaining.items() if count == 0]
+    visited = 0
+    while queue:
+        agent_id = queue.pop()
+        visited += 1
+        for child_id in dependents[agent_id]:
+            remaining[child_id] -= 1
+            if remaining[child_id] == 0:
+                queue.append(child_id)
+    
+    if visited != len(agent_ids):
+        cyclic = sorted(agent_id for agent_id, count in remaining.items() if count > 0)
+        raise ValueError(f"Agent dependency cycle detected: {', '.join(cyclic)}")
+    
+    return deps, dependents
+
+# ULTRA-FAST Website generation functions
+async def run_agent_graph(project_id: str, prompt: str, project_data: dict, agents: Optional[List[dict]] = None, concurrency: Optional[int] = None,
+                          on_phase_complete: Optional[Callable[[str], Awaitable[None]]] = None, pack_size: Optional[int] = None):
+    """Run agents as a dependency graph - each agent starts as soon as its inputs are complete"""
+    agents = agents if agents is not None else AGENTS
+    width = max(1, concurrency or AGENT_CONCURRENCY)
+    pack_size = max(1, pack_size or AGENT_PACK_SIZE)
+    deps, dependents = build_agent_graph(agents, AGENT_DEPENDENCIES)
+    
+    # Ready agents are started in declaration order so earlier phases are favoured
+    order = {agent["id"]: index for index, agent in enumerate(agents)}
+    by_id = {agent["id"]: agent for agent in agents}
+    remaining = {agent_id: len(parents) for agent_id, parents in deps.items()}
+    ready = [(order[agent_id], agent_id) for agent_id, count in remaining.items() if count == 0]
+    heapq.heapify(ready)
+    
+    phases = [phase for phase in PHASES if any(agent["phase"] == phase for agent in agents)]
+    phase_pending = {phase: sum(1 for agent in agents if agent["phase"] == phase) for phase in phases}
+    # Agents skipped by a resumed run still count towards progress
+    completed = len(AGENTS) - len(agents) if len(agents) <= len(AGENTS) else 0
+    total = max(len(AGENTS), len(agents))
+    current_phase = None
+    running: Dict[asyncio.Task, List[str]] = {}
+    write_buffer = get_write_buffer(project_id)
+    phase_started: Dict[str, float] = {}
+    
+    try:
+        while ready or running:
+            # Report the earliest phase that still has work outstanding
+            active_phase = next((phase for phase in phases if phase_pending[phase] > 0), None)
+            if active_phase and active_phase != current_phase:
+                current_phase = active_phase
+                progress = int((completed / total) * 75)  # 75% for agent work
+                write_buffer.set({"current_phase": current_phase, "progress": progress})
+                await manager.send_update(project_id, {
+                    "type": "phase_update",
+                    "phase": current_phase,
+                    "progress": progress
+                })
+            
+            while ready and len(running) < width:
+                # With packing enabled, ready agents share one LLM request
+                pack = [heapq.heappop(ready)[1] for _ in range(min(pack_size, len(ready)))]
+                for agent_id in pack:
+                    phase_started.setdefault(by_id[agent_id]["phase"], time.perf_counter())
+                task = asyncio.create_task(process_agent_pack(project_id, [by_id[agent_id] for agent_id in pack], prompt, project_data))
+                running[task] = pack
+            
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pack = running.pop(task)
+                task.result()
+                for agent_id in pack:
+                    completed += 1
+                    phase = by_id[agent_id]["phase"]
+                    phase_pending[phase] -= 1
+                    if phase_pending[phase] == 0:
+                        record_span("phase", phase_started[phase], project_id, phase=phase)
+                        # Phase boundary - persist its final agent states now
+                        await write_buffer.flush()
+                        if on_phase_complete:
+                            await on_phase_complete(phase)
+                    
+                    for child_id in dependents[agent_id]:
+                        remaining[child_id] -= 1
+                        if remaining[child_id] == 0:
+                            heapq.heappush(ready, (order[child_id], child_id))
+    finally:
+        for task in running:
+            task.cancel()
+
+async def mark_agent_active(project_id: str, agent: dict):
     # Update agent status to active
-    await db.projects.update_one(
-        {"project_id": project_id},
-        {
-            "$set": {
-                f"agents.{agent['id']}.status": "active",
-                f"agents.{agent['id']}.started_at": datetime.now(timezone.utc),
-                f"agents.{agent['id']}.task": f"Processing {agent['phase']} requirements"
-            }
-        }
-    )
+    get_write_buffer(project_id).set({
+        f"agents.{agent['id']}.status": "active",
+        f"agents.{agent['id']}.started_at": datetime.now(timezone.utc),
+        f"agents.{agent['id']}.task": f"Processing {agent['phase']} requirements"
+    })
     
     # Send WebSocket update
     await manager.send_update(project_id, {
@@ -239,102 +1650,399 @@ async def process_single_agent(project_id: str, agent: dict, prompt: str, projec
         "agent": agent,
         "status": "active"
     })
+
+async def mark_agent_complete(project_id: str, agent: dict):
+    # Update agent status to complete
+    get_write_buffer(project_id).set({
+        f"agents.{agent['id']}.status": "complete",
+        f"agents.{agent['id']}.completed_at": datetime.now(timezone.utc),
+        f"agents.{agent['id']}.progress": 100
+    })
     
-    # Simulate realistic processing time (much faster now)
-    processing_time = agent['duration'] / 1000  # Convert to seconds, much faster
-    await asyncio.sleep(processing_time)
-    
-    # Get AI response for this agent's specialization
+    # Send completion update
+    await manager.send_update(project_id, {
+        "type": "agent_update",
+        "agent": agent,
+        "status": "complete"
+    })
+
+def agent_output_document(project_id: str, agent: dict, output: str, call_stats: dict, **extra) -> dict:
+    return {
+        "project_id": project_id,
+        "agent_id": agent["id"],
+        "phase": agent["phase"],
+        "output": output,
+        "attempts": call_stats.get("attempts", 0),
+        "hedged": call_stats.get("hedged", False),
+        "cached": call_stats.get("cached", False),
+        "latency_ms": call_stats.get("latency_ms", 0),
+        **extra,
+        "timestamp": datetime.now(timezone.utc)
+    }
+
+async def run_agent_llm(project_id: str, agent: dict, prompt: str, project_data: dict):
+    """Get and store the AI response for one agent's specialization"""
+    call_stats = {}
     try:
         system_message = f"You are {agent['name']}, a specialist in {agent['specialization']}. Provide concise, actionable insights."
-        chat = get_ai_chat(f"{project_id}_{agent['id']}", system_message)
-        
-        user_message = UserMessage(
-            text=f"Project: {prompt}\nProvide your specialized analysis as {agent['name']} in 2-3 sentences."
+        ai_response = await send_ai_message(
+            f"{project_id}_{agent['id']}",
+            system_message,
+            f"Project: {prompt}\nProvide your specialized analysis as {agent['name']} in 2-3 sentences.",
+            bypass_cache=project_data.get('bypass_cache', False),
+            deadline=AGENT_DEADLINE,
+            hedge=True,
+            stats=call_stats
         )
         
-        ai_response = await chat.send_message(user_message)
-        
         # Store agent output
-        await db.agent_outputs.insert_one({
-            "project_id": project_id,
-            "agent_id": agent["id"],
-            "phase": agent["phase"],
-            "output": ai_response,
-            "timestamp": datetime.now(timezone.utc)
+        with span("mongo_write", collection="agent_outputs"):
+            await db.agent_outputs.insert_one(agent_output_document(project_id, agent, ai_response, call_stats))
+        
+    except Exception as e:
+        logging.error(f"AI processing error for agent {agent['id']} after {call_stats.get('attempts', 0)} attempts: {e}")
+        get_write_buffer(project_id).set({
+            f"agents.{agent['id']}.error": str(e),
+            f"agents.{agent['id']}.attempts": call_stats.get("attempts", 0),
+            f"agents.{agent['id']}.latency_ms": call_stats.get("latency_ms", 0)
         })
+
+async def process_single_agent(project_id: str, agent: dict, prompt: str, project_data: dict):
+    """Process a single agent with AI integration"""
+    await mark_agent_active(project_id, agent)
+    
+    # Simulate realistic processing time (much faster now)
+    processing_time = agent['duration'] / 1000  # Convert to seconds, much faster
+    with span("agent_work", project_id, agent['id'], phase=agent['phase']):
+        await asyncio.sleep(processing_time)
+    
+    with span("agent_llm", project_id, agent['id'], phase=agent['phase']):
+        await run_agent_llm(project_id, agent, prompt, project_data)
+    await mark_agent_complete(project_id, agent)
+
+# Agent packing - several agents answered by one LLM request
+AGENT_PACK_SIZE = int(os.environ.get('AGENT_PACK_SIZE', '1'))  # 1 disables packing
+
+PACKED_SYSTEM_MESSAGE = "You are a panel of website specialists. Answer as each specialist in turn. Provide concise, actionable insights."
+
+def build_packed_prompt(prompt: str, agents: List[dict]) -> str:
+    roles = "\n".join(f"- {agent['id']}: {agent['name']}, a specialist in {agent['specialization']}" for agent in agents)
+    return (
+        f"Project: {prompt}\n\n"
+        f"Specialists:\n{roles}\n\n"
+        "Provide each specialist's analysis in 2-3 sentences. Return ONLY a JSON object mapping each specialist id "
+        "to their analysis as a string, for example {\"agent_001\": \"...\"}."
+    )
+
+def parse_packed_response(response: str, agent_ids: List[str]) -> Dict[str, str]:
+    """Split a packed JSON answer back into per-agent outputs - agents missing from it are left out"""
+    match = re.search(r"\{.*\}", response, re.S)
+    if not match:
+        return {}
+    try:
+        answers = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+    return {
+        agent_id: answers[agent_id].strip()
+        for agent_id in agent_ids
+        if isinstance(answers.get(agent_id), str) and answers[agent_id].strip()
+    }
+
+async def process_agent_pack(project_id: str, agents: List[dict], prompt: str, project_data: dict):
+    """Process several agents with one packed LLM request, falling back to single calls for unparseable answers"""
+    if len(agents) == 1:
+        return await process_single_agent(project_id, agents[0], prompt, project_data)
+    
+    for agent in agents:
+        await mark_agent_active(project_id, agent)
+    
+    agent_ids = [agent["id"] for agent in agents]
+    pack_label = ",".join(agent_ids)
+    
+    # Packed agents work side by side
+    with span("agent_work", project_id, pack_label, phase=agents[0]['phase']):
+        await asyncio.sleep(max(agent['duration'] for agent in agents) / 1000)
+    
+    call_stats = {}
+    outputs = {}
+    llm_started = time.perf_counter()
+    try:
+        response = await send_ai_message(
+            f"{project_id}_pack_{'_'.join(agent_ids)}",
+            PACKED_SYSTEM_MESSAGE,
+            build_packed_prompt(prompt, agents),
+            bypass_cache=project_data.get('bypass_cache', False),
+            deadline=AGENT_DEADLINE,
+            hedge=True,
+            stats=call_stats
+        )
+        outputs = parse_packed_response(response, agent_ids)
+    except Exception as e:
+        logging.error(f"Packed AI request failed for agents {', '.join(agent_ids)}: {e}")
+    record_span("agent_llm", llm_started, project_id, pack_label, phase=agents[0]['phase'])
+    
+    if outputs:
+        with span("mongo_write", collection="agent_outputs"):
+            await db.agent_outputs.insert_many([
+                agent_output_document(project_id, agent, outputs[agent["id"]], call_stats, packed=True, pack_size=len(agents))
+                for agent in agents if agent["id"] in outputs
+            ])
+    
+    missing = [agent for agent in agents if agent["id"] not in outputs]
+    if missing:
+        logging.warning(f"Packed response missing {len(missing)} of {len(agents)} agents, falling back to single calls")
+        await asyncio.gather(*(run_agent_llm(project_id, agent, prompt, project_data) for agent in missing))
+    
+    for agent in agents:
+        await mark_agent_complete(project_id, agent)
+
+# Preview assembly and progressive streaming
+PREVIEW_CHUNK_INTERVAL = float(os.environ.get('PREVIEW_CHUNK_INTERVAL', '0.25'))  # seconds between preview_chunk updates
+
+# Document-level tags the model tends to wrap its markup in - stripped in one pass
+PREVIEW_WRAPPER_TAGS = re.compile(r"<!DOCTYPE html>|</?(?:html|head|body)>")
+
+def assemble_preview_html(title: str, html_content: str, css_content: str, js_content: str) -> str:
+    """Embed the generated CSS and JS into a single previewable HTML document"""
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        {css_content}
+    </style>
+</head>
+<body>
+    {PREVIEW_WRAPPER_TAGS.sub('', html_content)}
+    
+    <script>
+        {js_content}
+    </script>
+</body>
+</html>"""
+
+class PreviewStreamer:
+    """Coalesces streamed artifact tokens into periodic preview_chunk updates"""
+    def __init__(self, project_id: str, interval: float = PREVIEW_CHUNK_INTERVAL):
+        self.project_id = project_id
+        self.interval = interval
+        self._pending: Dict[str, List[str]] = {}
+        self._last_sent = 0.0
+
+    def chunk_handler(self, artifact: str) -> Callable[[str], Awaitable[None]]:
+        async def on_chunk(delta: str):
+            self._pending.setdefault(artifact, []).append(delta)
+            if time.monotonic() - self._last_sent >= self.interval:
+                await self.flush()
+        return on_chunk
+
+    async def flush(self, done_artifact: Optional[str] = None):
+        self._last_sent = time.monotonic()
+        for artifact in list(self._pending.keys()):
+            parts = self._pending.pop(artifact)
+            if parts or artifact == done_artifact:
+                await self._send(artifact, "".join(parts), artifact == done_artifact)
+
+    async def track(self, artifact: str, request: Awaitable[str]) -> str:
+        """Await an artifact request and mark its stream complete once it finishes"""
+        result = await request
+        self._pending.setdefault(artifact, [])
+        await self.flush(done_artifact=artifact)
+        return result
+
+    async def _send(self, artifact: str, delta: str, done: bool):
+        await manager.send_update(self.project_id, {
+            "type": "preview_chunk",
+            "artifact": artifact,
+            "delta": delta,
+            "done": done
+        })
+
+ARTIFACT_TIMEOUT = float(os.environ.get('ARTIFACT_TIMEOUT', '90'))  # seconds per generated artifact
+
+async def generate_artifacts(project_id: str, artifact_requests: Dict[str, Any], timeout: float = ARTIFACT_TIMEOUT) -> Dict[str, Optional[str]]:
+    """Run artifact generations concurrently - a failed or timed out artifact maps to None"""
+    names = list(artifact_requests.keys())
+    results = await asyncio.gather(
+        *(asyncio.wait_for(artifact_requests[name], timeout) for name in names),
+        return_exceptions=True
+    )
+    
+    artifacts = {}
+    failed = []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            reason = "timed out" if isinstance(result, asyncio.TimeoutError) else str(result)
+            logging.error(f"Artifact generation failed for {name} in project {project_id}: {reason}")
+            artifacts[name] = None
+            failed.append(name)
+        else:
+            artifacts[name] = result
+    
+    if len(failed) == len(names):
+        raise Exception(f"All artifact generations failed: {', '.join(failed)}")
+    
+    if failed:
+        await update_project(project_id, {"failed_artifacts": failed})
+        await manager.send_update(project_id, {
+            "type": "artifact_error",
+            "artifacts": failed
+        })
+    
+    return artifacts
+
+# Insight distillation
+INSIGHT_TOKEN_BUDGET = int(os.environ.get('INSIGHT_TOKEN_BUDGET', '600'))  # tokens of agent insights per file prompt
+INSIGHT_DUPLICATE_OVERLAP = 0.6  # share of terms two statements need in common to count as the same insight
+
+INSIGHT_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "your", "you", "are", "will", "can", "should", "from", "into",
+    "their", "they", "have", "has", "its", "use", "using", "our", "more", "also", "all", "any", "not", "but"
+}
+
+def split_insights(output: str) -> List[str]:
+    """Break an agent output into sentence-sized statements, without markdown bullets or headings"""
+    statements = []
+    for line in output.splitlines():
+        for sentence in re.split(r"(?<=[.!?])\s+", line.replace("**", "")):
+            sentence = re.sub(r"^[\s#>*\-•\d.)]+", "", sentence).strip()
+            if len(sentence.split()) >= 4:
+                statements.append(sentence)
+    return statements
+
+def insight_terms(statement: str) -> Set[str]:
+    return {word for word in re.findall(r"[a-z0-9]+", statement.lower()) if len(word) > 2 and word not in INSIGHT_STOPWORDS}
+
+def distill_insights(agent_outputs: List[dict], budget: int = INSIGHT_TOKEN_BUDGET) -> str:
+    """Merge agent outputs into a per-phase summary of at most budget tokens.
+    
+    Statements whose terms many agents of a phase share rank first, near-duplicates of a chosen statement
+    are dropped, and budget a phase leaves unused carries over to the next.
+    """
+    statements_by_phase: Dict[str, List[str]] = {}
+    for output in agent_outputs:
+        statements_by_phase.setdefault(output.get("phase", "general"), []).extend(split_insights(output.get("output") or ""))
+    phases = sorted((phase for phase, statements in statements_by_phase.items() if statements),
+                    key=lambda phase: PHASES.index(phase) if phase in PHASES else len(PHASES))
+    
+    sections = []
+    remaining = budget
+    # Terms of every statement kept so far - insights repeated in a later phase are dropped too
+    kept: List[Set[str]] = []
+    for index, phase in enumerate(phases):
+        phase_budget = remaining // (len(phases) - index)
+        statements = statements_by_phase[phase]
+        frequency = Counter(term for statement in statements for term in insight_terms(statement))
+        candidates = []
+        for statement in dict.fromkeys(statements):
+            terms = insight_terms(statement)
+            if terms:
+                # Consensus across agents, not statement length, decides the rank
+                candidates.append((sum(frequency[term] for term in terms) / len(terms) ** 0.5, statement, terms))
+        candidates.sort(key=lambda candidate: -candidate[0])
         
-    except Exception as e:
-        logging.error(f"AI processing error for agent {agent['id']}: {e}")
+        header = f"{phase.title()}:"
+        used = estimate_tokens(header)
+        chosen = []
+        for _, statement, terms in candidates:
+            if any(len(terms & other) / len(terms | other) >= INSIGHT_DUPLICATE_OVERLAP for other in kept):
+                continue
+            cost = estimate_tokens(statement) + 1
+            if used + cost > phase_budget:
+                continue
+            chosen.append(statement)
+            kept.append(terms)
+            used += cost
+        
+        if chosen:
+            sections.append("\n".join([header] + [f"- {statement}" for statement in chosen]))
+            remaining -= used
     
-    # Update agent status to complete
-    await db.projects.update_one(
-        {"project_id": project_id},
-        {
-            "$set": {
-                f"agents.{agent['id']}.status": "complete",
-                f"agents.{agent['id']}.completed_at": datetime.now(timezone.utc),
-                f"agents.{agent['id']}.progress": 100
-            }
-        }
+    return "\n\n".join(sections)
+
+async def get_insight_summary(project_id: str, budget: int = INSIGHT_TOKEN_BUDGET) -> str:
+    """Distilled agent insights for a project, computed once and cached on the project"""
+    project, output_count = await asyncio.gather(
+        db.projects.find_one({"project_id": project_id}, {"_id": 0, "insight_summary": 1}),
+        db.agent_outputs.count_documents({"project_id": project_id})
     )
     
-    # Send completion update
-    await manager.send_update(project_id, {
-        "type": "agent_update",
-        "agent": agent,
-        "status": "complete"
-    })
+    # The count is answered from the (project_id, phase) index - outputs are only loaded on a miss
+    cached = (project or {}).get("insight_summary")
+    if cached and cached.get("budget") == budget and cached.get("outputs") == output_count:
+        return cached["text"]
+    
+    agent_outputs = await db.agent_outputs.find({"project_id": project_id}, {"_id": 0, "phase": 1, "output": 1}).to_list(None)
+    summary = await asyncio.to_thread(distill_insights, agent_outputs, budget)
+    await update_project(project_id, {"insight_summary": {"budget": budget, "outputs": len(agent_outputs), "text": summary}})
+    return summary
 
 async def generate_instant_website_files(project_id: str, prompt: str, project_data: dict):
     """Generate website files with INSTANT preview"""
     try:
-        # Get consolidated agent insights
-        agent_outputs = await db.agent_outputs.find({"project_id": project_id}).to_list(None)
+        # Get consolidated agent insights - distilled to a fixed token budget however many agents ran
+        insights = await get_insight_summary(project_id)
         
         # Create comprehensive context
         context = f"Project Requirements: {prompt}\n\nBusiness Type: {project_data.get('business_type', 'general')}\nTarget Audience: {project_data.get('target_audience', 'general users')}\n\n"
+        if insights:
+            context += f"Specialist Agent Insights:\n{insights}\n\n"
         
-        # Generate HTML with INSTANT results
-        html_chat = get_ai_chat(f"{project_id}_html", "You are an expert web developer. Generate modern, stunning HTML with proper structure. Make it production-ready and visually impressive.")
-        html_message = UserMessage(
-            text=f"Create a complete, modern HTML document for: {prompt}\n\nMake it:\n- Visually stunning with modern design\n- Fully responsive\n- Include proper meta tags\n- Add structured data\n- Make it production-ready\n\nReturn ONLY the HTML code."
-        )
-        html_content = await html_chat.send_message(html_message)
+        bypass_cache = project_data.get('bypass_cache', False)
+        streamer = PreviewStreamer(project_id)
         
-        # Generate CSS with amazing styling
-        css_chat = get_ai_chat(f"{project_id}_css", "You are a CSS master creating visually stunning, modern designs with incredible animations and effects.")
-        css_message = UserMessage(
-            text=f"Create stunning CSS for: {prompt}\n\nInclude:\n- Modern color schemes and gradients\n- Smooth animations and transitions\n- Responsive design with CSS Grid/Flexbox\n- Beautiful typography\n- Hover effects and micro-interactions\n- Professional shadows and depth\n\nReturn ONLY the CSS code."
-        )
-        css_content = await css_chat.send_message(css_message)
+        # Generate every artifact concurrently - they do not depend on each other.
+        # Preview artifacts stream to the client as they are produced.
+        artifact_requests = {
+            # Generate HTML with INSTANT results
+            "html": streamer.track("html", send_ai_message(
+                f"{project_id}_html",
+                "You are an expert web developer. Generate modern, stunning HTML with proper structure. Make it production-ready and visually impressive.",
+                f"Create a complete, modern HTML document for: {prompt}\n\n{context}Make it:\n- Visually stunning with modern design\n- Fully responsive\n- Include proper meta tags\n- Add structured data\n- Make it production-ready\n\nReturn ONLY the HTML code.",
+                bypass_cache=bypass_cache,
+                on_chunk=streamer.chunk_handler("html")
+            )),
+            # Generate CSS with amazing styling
+            "css": streamer.track("css", send_ai_message(
+                f"{project_id}_css",
+                "You are a CSS master creating visually stunning, modern designs with incredible animations and effects.",
+                f"Create stunning CSS for: {prompt}\n\n{context}Include:\n- Modern color schemes and gradients\n- Smooth animations and transitions\n- Responsive design with CSS Grid/Flexbox\n- Beautiful typography\n- Hover effects and micro-interactions\n- Professional shadows and depth\n\nReturn ONLY the CSS code.",
+                bypass_cache=bypass_cache,
+                on_chunk=streamer.chunk_handler("css")
+            )),
+            # Generate JavaScript for interactivity
+            "js": streamer.track("js", send_ai_message(
+                f"{project_id}_js",
+                "You are a JavaScript expert creating smooth, modern interactions and functionality.",
+                f"Create modern JavaScript for: {prompt}\n\n{context}Include:\n- Smooth scroll effects\n- Interactive elements\n- Form validation\n- Mobile menu functionality\n- Modern ES6+ features\n\nReturn ONLY the JavaScript code.",
+                bypass_cache=bypass_cache,
+                on_chunk=streamer.chunk_handler("js")
+            )),
+        }
         
-        # Generate JavaScript for interactivity
-        js_chat = get_ai_chat(f"{project_id}_js", "You are a JavaScript expert creating smooth, modern interactions and functionality.")
-        js_message = UserMessage(
-            text=f"Create modern JavaScript for: {prompt}\n\nInclude:\n- Smooth scroll effects\n- Interactive elements\n- Form validation\n- Mobile menu functionality\n- Modern ES6+ features\n\nReturn ONLY the JavaScript code."
-        )
-        js_content = await js_chat.send_message(js_message)
+        # If authentication requested, generate the FastAPI backend alongside
+        if project_data.get('include_auth'):
+            artifact_requests["backend"] = send_ai_message(
+                f"{project_id}_backend",
+                "You are a backend expert creating secure FastAPI applications with authentication.",
+                f"Create a complete FastAPI backend with JWT authentication, user registration/login, and database models for: {prompt}\n\nInclude:\n- User management endpoints\n- JWT token authentication\n- Password hashing\n- Database models\n- CORS setup\n\nReturn ONLY the Python code for server.py",
+                bypass_cache=bypass_cache
+            )
+        
+        artifacts = await generate_artifacts(project_id, artifact_requests)
+        
+        # Fall back to placeholders so one failed artifact does not discard the others
+        html_content = artifacts.get("html") or f"<main>\n    <h1>{html.escape(project_data.get('title', 'Generated Website'))}</h1>\n    <p>{html.escape(prompt)}</p>\n</main>"
+        css_content = artifacts.get("css") or "/* Styles could not be generated - regenerate to try again */"
+        js_content = artifacts.get("js") or "// Scripts could not be generated - regenerate to try again"
         
         # Create complete HTML with embedded CSS and JS for instant preview
-        preview_html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{project_data.get('title', 'Generated Website')}</title>
-    <style>
-        {css_content}
-    </style>
-</head>
-<body>
-    {html_content.replace('<!DOCTYPE html>', '').replace('<html>', '').replace('</html>', '').replace('<head>', '').replace('</head>', '').replace('<body>', '').replace('</body>', '')}
-    
-    <script>
-        {js_content}
-    </script>
-</body>
-</html>"""
+        preview_html = assemble_preview_html(project_data.get('title', 'Generated Website'), html_content, css_content, js_content)
         
         # Generate additional files
         files = {
@@ -399,15 +2107,10 @@ Project ID: {project_id}
         
         # If authentication requested, add backend files
         if project_data.get('include_auth'):
-            # Generate FastAPI backend
-            backend_chat = get_ai_chat(f"{project_id}_backend", "You are a backend expert creating secure FastAPI applications with authentication.")
-            backend_message = UserMessage(
-                text=f"Create a complete FastAPI backend with JWT authentication, user registration/login, and database models for: {prompt}\n\nInclude:\n- User management endpoints\n- JWT token authentication\n- Password hashing\n- Database models\n- CORS setup\n\nReturn ONLY the Python code for server.py"
-            )
-            backend_content = await backend_chat.send_message(backend_message)
+            if artifacts.get("backend"):
+                files["backend/server.py"] = artifacts["backend"]
             
             files.update({
-                "backend/server.py": backend_content,
                 "backend/requirements.txt": """fastapi==0.110.1
 uvicorn[standard]==0.25.0
 python-dotenv>=1.0.1
@@ -461,22 +2164,140 @@ class TokenData(BaseModel):
         logging.error(f"Error generating website files: {e}")
         raise e
 
+# GitHub API client
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+GITHUB_MAX_CONNECTIONS = int(os.environ.get('GITHUB_MAX_CONNECTIONS', '10'))
+GITHUB_UPLOAD_CONCURRENCY = int(os.environ.get('GITHUB_UPLOAD_CONCURRENCY', '5'))
+GITHUB_MAX_RETRIES = int(os.environ.get('GITHUB_MAX_RETRIES', '3'))
+GITHUB_MAX_BACKOFF = float(os.environ.get('GITHUB_MAX_BACKOFF', '60'))
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+# Transport errors raised before the request reached GitHub - safe to retry whatever the method
+UNSENT_REQUEST_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header in either delay-seconds or HTTP-date form, None if absent or malformed"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class GitHubClient:
+    """Async GitHub REST client on a keep-alive connection pool with rate-limit aware backoff"""
+    def __init__(self, token: str, base_url: str = GITHUB_API_URL, max_connections: int = GITHUB_MAX_CONNECTIONS,
+                 max_retries: int = GITHUB_MAX_RETRIES, max_backoff: float = GITHUB_MAX_BACKOFF):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        # Wall-clock time until which every request waits (primary rate limit exhausted)
+        self._paused_until = 0.0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'Authorization': f'token {self.token}',
+                    'Accept': 'application/vnd.github.v3+json',
+                    'User-Agent': 'FlowForge-AI'
+                },
+                timeout=httpx.Timeout(15.0),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _retry_delay(self, response: httpx.Response, attempt: int, idempotent: bool = True) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the response should be returned as is"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining == '0' and reset:
+            self._paused_until = max(self._paused_until, float(reset))
+        
+        if response.status_code in (403, 429):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+            if remaining == '0' and reset:
+                return max(0.0, float(reset) - time.time())
+            if response.status_code == 403:
+                # Plain permission error - retrying will not help
+                return None
+            return min(self.max_backoff, 2 ** attempt)
+        
+        if response.status_code >= 500:
+            if not idempotent:
+                # The request may have been applied before the error - a retry could repeat it
+                return None
+            return min(self.max_backoff, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+        
+        return None
+
+    async def request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """Send a request, backing off on rate limits, 5xx responses and connection errors.
+        
+        Non-idempotent requests (POST unless the caller says otherwise) are only retried when GitHub cannot
+        have applied them: connection failures and rate-limit rejections.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            pause = self._paused_until - time.time()
+            if pause > 0:
+                await asyncio.sleep(min(pause, self.max_backoff))
+            
+            try:
+                with span("github_request", method=method):
+                    response = await client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries or not (idempotent or isinstance(e, UNSENT_REQUEST_ERRORS)):
+                    raise
+                delay = min(self.max_backoff, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                logging.warning(f"GitHub {method} {path} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            delay = self._retry_delay(response, attempt, idempotent)
+            if delay is None or attempt == self.max_retries or delay > self.max_backoff:
+                return response
+            
+            logging.warning(f"GitHub {method} {path} returned {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        return response
+
+_github_client: Optional[GitHubClient] = None
+
+def get_github_client() -> GitHubClient:
+    """Shared GitHub client so deploys reuse pooled connections"""
+    global _github_client
+    github_token = os.environ.get('GITHUB_TOKEN')
+    if not github_token:
+        raise Exception("GitHub token not configured")
+    
+    if _github_client is None or _github_client.token != github_token:
+        _github_client = GitHubClient(github_token)
+    return _github_client
+
 async def deploy_to_github_ultra_fast(project_id: str, files: Dict[str, str], project_data: dict):
     """Ultra-fast GitHub deployment"""
     try:
-        github_token = os.environ.get('GITHUB_TOKEN')
-        if not github_token:
-            raise Exception("GitHub token not configured")
-        
+        github = get_github_client()
         repo_name = f"flowforge-{project_id[:8]}"
         
-        # Create repository
-        headers = {
-            'Authorization': f'token {github_token}',
-            'Accept': 'application/vnd.github.v3+json',
-            'User-Agent': 'FlowForge-AI'
-        }
-        
         repo_data = {
             'name': repo_name,
             'description': f"🚀 AI-Generated Website by FlowForge - {project_data.get('title', 'Modern Website')}",
@@ -485,46 +2306,28 @@ async def deploy_to_github_ultra_fast(project_id: str, files: Dict[str, str], pr
             'homepage': f"https://{repo_name}.github.io"
         }
         
-        repo_response = requests.post(
-            'https://api.github.com/user/repos',
-            json=repo_data,
-            headers=headers,
-            timeout=15
-        )
+        repo_response = await github.request('POST', '/user/repos', json=repo_data)
         
         if repo_response.status_code == 201:
             repo_info = repo_response.json()
             repo_url = repo_info['html_url']
             
-            # Upload files in parallel batches for speed
-            upload_tasks = []
-            for file_path, content in files.items():
-                upload_tasks.append(upload_file_to_github(headers, repo_info['full_name'], file_path, content))
-                
-                # Process in small batches to avoid rate limits
-                if len(upload_tasks) >= 5:
-                    await asyncio.gather(*upload_tasks, return_exceptions=True)
-                    upload_tasks = []
-                    await asyncio.sleep(0.5)  # Brief pause
-            
-            # Upload remaining files
-            if upload_tasks:
-                await asyncio.gather(*upload_tasks, return_exceptions=True)
+            # Push every file in a single commit
+            branch = repo_info.get('default_branch', 'main')
+            await push_files_to_github(github, repo_info['full_name'], branch, files, "🚀 Add FlowForge generated website")
             
             # Enable GitHub Pages
             pages_data = {
                 'source': {
-                    'branch': 'main',
+                    'branch': branch,
                     'path': '/'
                 }
             }
             
-            pages_response = requests.post(
-                f"https://api.github.com/repos/{repo_info['full_name']}/pages",
-                json=pages_data,
-                headers=headers,
-                timeout=10
-            )
+            try:
+                await github.request('POST', f"/repos/{repo_info['full_name']}/pages", json=pages_data)
+            except httpx.HTTPError as e:
+                logging.error(f"Failed to enable GitHub Pages: {e}")
             
             github_pages_url = f"https://{repo_info['owner']['login']}.github.io/{repo_name}"
             
@@ -540,30 +2343,555 @@ async def deploy_to_github_ultra_fast(project_id: str, files: Dict[str, str], pr
         logging.error(f"GitHub deployment error: {e}")
         raise e
 
-async def upload_file_to_github(headers: dict, repo_full_name: str, file_path: str, content: str):
-    """Upload a single file to GitHub"""
-    try:
-        file_data = {
-            'message': f'Add {file_path}',
-            'content': base64.b64encode(content.encode()).decode()
-        }
-        
-        response = requests.put(
-            f"https://api.github.com/repos/{repo_full_name}/contents/{file_path}",
-            json=file_data,
-            headers=headers,
-            timeout=10
+async def push_files_to_github(github: GitHubClient, repo_full_name: str, branch: str, files: Dict[str, str], message: str):
+    """Push all files as one commit via the Git data API - blobs upload concurrently, then one tree and one commit"""
+    # A freshly auto-initialised repository can take a moment before its branch ref exists
+    for attempt in range(GITHUB_MAX_RETRIES + 1):
+        ref_response = await github.request('GET', f"/repos/{repo_full_name}/git/ref/heads/{branch}")
+        if ref_response.status_code == 200 or attempt == GITHUB_MAX_RETRIES:
+            break
+        await asyncio.sleep(0.5 * 2 ** attempt)
+    if ref_response.status_code != 200:
+        raise Exception(f"Failed to read {branch} branch: {ref_response.text}")
+    head_sha = ref_response.json()['object']['sha']
+    
+    commit_response = await github.request('GET', f"/repos/{repo_full_name}/git/commits/{head_sha}")
+    if commit_response.status_code != 200:
+        raise Exception(f"Failed to read head commit: {commit_response.text}")
+    base_tree_sha = commit_response.json()['tree']['sha']
+    
+    # Git objects stay unreferenced until the ref update, so their POSTs are safe to retry (idempotent=True)
+    semaphore = asyncio.Semaphore(GITHUB_UPLOAD_CONCURRENCY)
+    
+    async def create_blob(file_path: str, content: str):
+        async with semaphore:
+            response = await github.request('POST', f"/repos/{repo_full_name}/git/blobs", idempotent=True, json={
+                'content': base64.b64encode(content.encode()).decode(),
+                'encoding': 'base64'
+            })
+        if response.status_code != 201:
+            raise Exception(f"Failed to upload {file_path}: {response.text}")
+        return {'path': file_path, 'mode': '100644', 'type': 'blob', 'sha': response.json()['sha']}
+    
+    tree_entries = await asyncio.gather(*(create_blob(file_path, content) for file_path, content in files.items()))
+    
+    tree_response = await github.request('POST', f"/repos/{repo_full_name}/git/trees", idempotent=True, json={
+        'base_tree': base_tree_sha,
+        'tree': tree_entries
+    })
+    if tree_response.status_code != 201:
+        raise Exception(f"Failed to create tree: {tree_response.text}")
+    
+    new_commit_response = await github.request('POST', f"/repos/{repo_full_name}/git/commits", idempotent=True, json={
+        'message': message,
+        'tree': tree_response.json()['sha'],
+        'parents': [head_sha]
+    })
+    if new_commit_response.status_code != 201:
+        raise Exception(f"Failed to create commit: {new_commit_response.text}")
+    commit_sha = new_commit_response.json()['sha']
+    
+    update_response = await github.request('PATCH', f"/repos/{repo_full_name}/git/refs/heads/{branch}", json={'sha': commit_sha})
+    if update_response.status_code != 200:
+        raise Exception(f"Failed to update {branch} branch: {update_response.text}")
+    
+    return commit_sha
+
+# Durable generation job queue
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', '2'))  # concurrent generations per process
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', '30'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '1'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+GENERATION_QUEUE_LIMIT = int(os.environ.get('GENERATION_QUEUE_LIMIT', '50'))  # queued jobs per priority class and above
+GENERATION_ETA_SECONDS = float(os.environ.get('GENERATION_ETA_SECONDS', '90'))  # initial estimate of one generation
+PRIORITY_CLASSES = {"paid": 0, "free": 1}  # lower is claimed first
+PAID_API_KEYS = {key.strip() for key in os.environ.get('PAID_API_KEYS', '').split(',') if key.strip()}
+
+class GenerationJobQueue:
+    """Mongo-backed generation queue - workers lease jobs, heartbeat while running and resume from checkpoints"""
+    def __init__(self, collection, workers: int = GENERATION_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS,
+                 poll_interval: float = JOB_POLL_INTERVAL, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 max_queued: int = GENERATION_QUEUE_LIMIT):
+        self.collection = collection
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_queued = max_queued
+        self.average_seconds = GENERATION_ETA_SECONDS  # moving average of completed generations
+        self.stats = Counter()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("job_id", unique=True)
+        # Serves claim() - queued or expired jobs, highest priority then oldest first - and admission counts
+        await self.collection.create_index([("status", 1), ("priority", 1), ("created_at", 1), ("lease_expires_at", 1)])
+        await self.collection.create_index("lease_owner")
+
+    async def admission(self, priority: int) -> Optional[dict]:
+        """Queue position and ETA a new job at priority would get, or None if its class is full.
+
+        Only jobs at the same or a higher priority count against the limit, so a backlog of free
+        jobs never turns paid work away. The check is not atomic with enqueue - concurrent
+        submissions can overshoot the limit by a few jobs.
+        """
+        ahead = await self.collection.count_documents({"status": "queued", "priority": {"$lte": priority}})
+        if ahead >= self.max_queued:
+            self.stats["rejected"] += 1
+            return None
+        self.stats["admitted"] += 1
+        return {"position": ahead + 1, "eta_seconds": self.eta(ahead + 1)}
+
+    def eta(self, position: int) -> int:
+        """Seconds until a job at position finishes, if each worker completes one job per average_seconds"""
+        return math.ceil(math.ceil(position / self.workers) * self.average_seconds)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        return max(1, math.ceil(self.average_seconds / self.workers))
+
+    async def enqueue(self, project_id: str, prompt: str, project_data: dict, priority: int = PRIORITY_CLASSES["free"]):
+        now = datetime.now(timezone.utc)
+        await self.collection.insert_one({
+            "job_id": project_id,
+            "project_id": project_id,
+            "prompt": prompt,
+            "project_data": {key: value for key, value in project_data.items() if key != "_id"},
+            "priority": priority,
+            "status": "queued",
+            "attempts": 0,
+            "lease_owner": None,
+            "lease_expires_at": now,
+            "checkpoint": {},
+            "created_at": now,
+            "updated_at": now
+        })
+        self._wakeup.set()
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand unfinished jobs back so another process resumes them without waiting for the lease to expire
+        await self.collection.update_many(
+            {"lease_owner": WORKER_ID, "status": "running"},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc)}}
         )
+
+    async def claim(self) -> Optional[dict]:
+        """Atomically lease the highest-priority, oldest queued job or a running job whose lease has expired"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "lease_expires_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_owner": WORKER_ID,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("priority", 1), ("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def checkpoint(self, job_id: str, fields: dict):
+        await self.collection.update_one(
+            {"job_id": job_id, "lease_owner": WORKER_ID},
+            {"$set": {**{f"checkpoint.{key}": value for key, value in fields.items()}, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception as e:
+                logging.error(f"Failed to claim generation job: {e}")
+                job = None
+            
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Generation job {job['job_id']} failed: {e}")
+
+    async def _run(self, job: dict):
+        job_id = job["job_id"]
+        if job["attempts"] > self.max_attempts:
+            await self._finish(job_id, "failed")
+            await update_project(job["project_id"], {
+                "status": "error",
+                "error": "Generation abandoned after repeated interruptions",
+                "completed_at": datetime.now(timezone.utc)
+            })
+            return
         
-        return response.status_code in [200, 201]
-    except Exception as e:
-        logging.error(f"Failed to upload {file_path}: {e}")
+        generation = asyncio.create_task(generate_website_ultra_fast(
+            job["project_id"],
+            job["prompt"],
+            job["project_data"],
+            checkpoint=job.get("checkpoint"),
+            save_checkpoint=lambda fields: self.checkpoint(job_id, fields),
+            resumed=job["attempts"] > 1
+        ))
+        lease_lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, generation, lease_lost))
+        started = time.monotonic()
+        try:
+            await generation
+        except asyncio.CancelledError:
+            if not lease_lost.is_set():
+                raise
+            logging.warning(f"Lease lost for generation job {job_id}, another worker will resume it")
+            return
+        finally:
+            heartbeat.cancel()
+        
+        project = await db.projects.find_one({"project_id": job["project_id"]}, {"_id": 0, "status": 1})
+        failed = bool(project and project.get("status") == "error")
+        if not failed and not job.get("checkpoint"):
+            # Resumed runs skip work and would drag the estimate down
+            self.average_seconds += 0.2 * (time.monotonic() - started - self.average_seconds)
+        await self._finish(job_id, "failed" if failed else "complete")
+
+    async def _heartbeat(self, job_id: str, generation: asyncio.Task, lease_lost: asyncio.Event):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await self.collection.update_one(
+                    {"job_id": job_id, "lease_owner": WORKER_ID, "status": "running"},
+                    {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logging.error(f"Lease heartbeat failed for generation job {job_id}: {e}")
+                continue
+            if result.matched_count == 0:
+                lease_lost.set()
+                generation.cancel()
+                return
+
+    async def _finish(self, job_id: str, status: str):
+        await self.collection.update_one(
+            {"job_id": job_id, "lease_owner": WORKER_ID},
+            {"$set": {"status": status, "lease_owner": None, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+job_queue = GenerationJobQueue(db.generation_jobs)
+
+# Index bootstrap
+AGENT_OUTPUT_TTL = int(os.environ.get('AGENT_OUTPUT_TTL', str(7 * 86400)))  # seconds, 0 keeps outputs forever
+FAILED_PROJECT_TTL = int(os.environ.get('FAILED_PROJECT_TTL', str(30 * 86400)))  # seconds after an error
+ABANDONED_PROJECT_TTL = int(os.environ.get('ABANDONED_PROJECT_TTL', str(7 * 86400)))  # seconds without progress
+
+async def ensure_indexes():
+    """Create every index the module queries rely on - idempotent, run at startup"""
+    steps = {
+        "projects": lambda: asyncio.gather(
+            db.projects.create_index("project_id", unique=True),
+            ensure_ttl_index(db.projects, "completed_at", FAILED_PROJECT_TTL, "failed_project_ttl", {"status": "error"}),
+            ensure_ttl_index(db.projects, "updated_at", ABANDONED_PROJECT_TTL, "abandoned_project_ttl", {"status": "generating"})
+        ),
+        "agent_outputs": lambda: asyncio.gather(
+            db.agent_outputs.create_index([("project_id", 1), ("phase", 1)]),
+            ensure_ttl_index(db.agent_outputs, "timestamp", AGENT_OUTPUT_TTL, "timestamp_ttl")
+        ),
+        "llm_cache": llm_cache.ensure_indexes,
+        "generation_jobs": job_queue.ensure_indexes,
+        "project_events": event_log.ensure_indexes,
+    }
+    for name, step in steps.items():
+        try:
+            await step()
+        except Exception as e:
+            # A bad index (e.g. duplicates blocking a unique one) must not keep the API down
+            logging.error(f"Index bootstrap failed for {name}: {e}")
+
+# Project downloads
+DOWNLOAD_COMPRESSION_LEVEL = int(os.environ.get('DOWNLOAD_COMPRESSION_LEVEL', '6'))  # zlib level, 0-9
+DOWNLOAD_CACHE_BYTES = int(os.environ.get('DOWNLOAD_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+class ArchiveSink:
+    """Write-only file object zipfile writes into, so the archive can be streamed while it is built"""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        chunks, self._chunks = self._chunks, []
+        return b"".join(chunks)
+
+class ArchiveBuild:
+    """One in-progress ZIP build that any number of downloads can stream from"""
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.archive: Optional[bytes] = None
+        self.error: Optional[Exception] = None
+        self.finished = asyncio.Event()
+        self._changed = asyncio.Event()
+        # The event loop only holds tasks weakly - the build keeps its own alive
+        self.task: Optional[asyncio.Task] = None
+
+    def append(self, chunk: bytes):
+        if chunk:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error: Optional[Exception] = None):
+        self.error = error
+        if error is None:
+            self.archive = b"".join(self.chunks)
+        self.finished.set()
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self):
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.error is not None:
+                raise self.error
+            if self.finished.is_set():
+                return
+            await changed.wait()
+
+    async def result(self) -> bytes:
+        await self.finished.wait()
+        if self.error is not None:
+            raise self.error
+        return self.archive
+
+class ArchiveCache:
+    """Finished ZIP archives keyed by content hash, bounded by total size.
+    
+    Concurrent downloads of the same content share one build, so N downloads cost one compression.
+    """
+    def __init__(self, max_bytes: int = DOWNLOAD_CACHE_BYTES, level: int = DOWNLOAD_COMPRESSION_LEVEL):
+        self.max_bytes = max_bytes
+        self.level = level
+        self._archives: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._building: Dict[str, ArchiveBuild] = {}
+        self.stats = {"hits": 0, "shared_builds": 0, "builds": 0}
+
+    def key(self, files_digest: str) -> str:
+        return hashlib.sha256(f"{files_digest}:{self.level}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        archive = self._archives.get(key)
+        if archive is not None:
+            self._archives.move_to_end(key)
+            self.stats["hits"] += 1
+        return archive
+
+    def build(self, key: str, load_files: Callable[[], Awaitable[Dict[str, str]]]) -> ArchiveBuild:
+        """Join the running build for key or start one - it completes even if every client disconnects"""
+        build = self._building.get(key)
+        if build is not None:
+            self.stats["shared_builds"] += 1
+            return build
+        build = self._building[key] = ArchiveBuild()
+        self.stats["builds"] += 1
+        build.task = asyncio.create_task(self._build(key, load_files, build))
+        return build
+
+    async def _build(self, key: str, load_files: Callable[[], Awaitable[Dict[str, str]]], build: ArchiveBuild):
+        sink = ArchiveSink()
+        try:
+            files = await load_files()
+            with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, compresslevel=self.level) as zip_file:
+                for file_path, content in files.items():
+                    # Compression runs off the event loop, one file at a time
+                    await asyncio.to_thread(zip_file.writestr, file_path, content)
+                    build.append(sink.take())
+            build.append(sink.take())  # central directory
+            build.finish()
+            self._store(key, build.archive)
+        except Exception as e:
+            logging.error(f"Failed to build archive {key}: {e}")
+            build.finish(e)
+        finally:
+            self._building.pop(key, None)
+
+    def _store(self, key: str, archive: bytes):
+        if len(archive) > self.max_bytes:
+            return
+        self._archives[key] = archive
+        self._size += len(archive)
+        while self._size > self.max_bytes:
+            _, evicted = self._archives.popitem(last=False)
+            self._size -= len(evicted)
+
+download_archives = ArchiveCache()
+
+def project_files_digest(project: dict) -> str:
+    """Content hash of a project's files, without loading them when a manifest exists"""
+    if project.get("file_manifest"):
+        entries = sorted(project["file_manifest"].items())
+    else:
+        entries = sorted((path, blob_hash(content.encode())) for path, content in project["generated_files"].items())
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single "bytes=" range, None to serve the whole body.
+    
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None  # multiple or malformed ranges - send everything
+    first, last = match.group(1), match.group(2)
+    if first and last and int(last) < int(first):
+        return None  # invalid rather than unsatisfiable - RFC 9110 says to ignore it
+    if first == "":
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+# Preview serving
+PREVIEW_CACHE_SIZE = int(os.environ.get('PREVIEW_CACHE_SIZE', '128'))  # projects
+PREVIEW_CACHE_CONTROL = os.environ.get('PREVIEW_CACHE_CONTROL', 'public, max-age=60, must-revalidate')
+
+def compress_preview(body: bytes) -> Dict[str, bytes]:
+    """The preview in every supported Content-Encoding"""
+    encodings = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=11)
+    return encodings
+
+async def store_preview_encodings(preview_html: str) -> Dict[str, str]:
+    """Compress a finished preview once and keep each encoding in the blob store"""
+    encodings = await asyncio.to_thread(compress_preview, preview_html.encode())
+    names = list(encodings)
+    digests = await asyncio.gather(*(blob_store.put(encodings[name]) for name in names))
+    return dict(zip(names, digests))
+
+class PreviewCache:
+    """Finished previews by project, in every encoding - hot previews are served without touching Mongo.
+    
+    A project's preview never changes once it is set, so entries need no invalidation.
+    """
+    def __init__(self, max_size: int = PREVIEW_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, project_id: str) -> Optional[dict]:
+        entry = self._entries.get(project_id)
+        if entry is not None:
+            self._entries.move_to_end(project_id)
+        return entry
+
+    def put(self, project_id: str, digest: str, bodies: Dict[str, bytes]):
+        self._entries[project_id] = {"hash": digest, "bodies": bodies}
+        self._entries.move_to_end(project_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+preview_cache = PreviewCache()
+
+async def load_preview(project_id: str) -> Optional[dict]:
+    """Cached preview entry for a project, None while the preview is still being generated"""
+    entry = preview_cache.get(project_id)
+    if entry is not None:
+        return entry
+    
+    project = await db.projects.find_one(
+        {"project_id": project_id},
+        {"_id": 0, "preview_hash": 1, "preview_encodings": 1, "preview_html": 1}
+    )
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    if project.get("preview_hash"):
+        digest = project["preview_hash"]
+        encodings = project.get("preview_encodings") or {}
+        names = list(encodings)
+        contents = await asyncio.gather(blob_store.get(digest), *(blob_store.get(encodings[name]) for name in names))
+        body, bodies = contents[0], dict(zip(names, contents[1:]))
+    elif project.get("preview_html"):
+        body = project["preview_html"].encode()
+        digest, bodies = blob_hash(body), {}
+    else:
+        return None
+    
+    if not bodies:
+        # Projects finished before previews were precompressed
+        bodies = await asyncio.to_thread(compress_preview, body)
+    preview_cache.put(project_id, digest, {"identity": body, **bodies})
+    return preview_cache.get(project_id)
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """Best Content-Encoding the client accepts - brotli, then gzip, then none"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        match = re.search(r"q=([0-9.]+)", params)
+        try:
+            accepted[token.strip().lower()] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            accepted[token.strip().lower()] = 0.0
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check shared by every conditional route - weak comparison, lists and * included"""
+    if not if_none_match:
         return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 # API Routes
 @api_router.post("/generate")
-async def generate_website(request: GenerateWebsiteRequest, background_tasks: BackgroundTasks):
-    """Start ULTRA-FAST website generation process"""
+async def generate_website(request: GenerateWebsiteRequest, http_request: Request):
+    """Start ULTRA-FAST website generation process - queued behind GENERATION_WORKERS active ones, 429 once the queue is full"""
+    priority_class = request.priority or "free"
+    if priority_class not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority class: {priority_class}")
+    if priority_class == "paid" and http_request.headers.get("x-api-key") not in PAID_API_KEYS:
+        raise HTTPException(status_code=403, detail="Paid priority requires a valid API key")
+    
+    queue = await job_queue.admission(PRIORITY_CLASSES[priority_class])
+    if queue is None:
+        retry_after = job_queue.retry_after()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Generation queue is full, retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     project_id = str(uuid.uuid4())
     
     # Initialize project in database
@@ -573,6 +2901,7 @@ async def generate_website(request: GenerateWebsiteRequest, background_tasks: Ba
         "business_type": request.business_type,
         "target_audience": request.target_audience,
         "include_auth": request.include_auth,
+        "bypass_cache": request.bypass_cache,
         "status": "generating",
         "progress": 0,
         "current_phase": "analysis",
@@ -584,166 +2913,401 @@ async def generate_website(request: GenerateWebsiteRequest, background_tasks: Ba
             "status": "idle",
             "progress": 0
         } for agent in AGENTS},
-        "created_at": datetime.now(timezone.utc)
+        "version": 0,
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     }
     
     await db.projects.insert_one(project_data)
     
-    # Start ULTRA-FAST background generation
-    background_tasks.add_task(generate_website_ultra_fast, project_id, request.prompt, project_data)
+    # Queue ULTRA-FAST generation - a worker on any node picks it up
+    await job_queue.enqueue(project_id, request.prompt, project_data, PRIORITY_CLASSES[priority_class])
     
-    return {"project_id": project_id, "status": "generating", "message": "🚀 88 AI agents activated! Generation starting..."}
+    return {
+        "project_id": project_id,
+        "status": "generating",
+        "message": "🚀 88 AI agents activated! Generation starting...",
+        "queue": {**queue, "priority": priority_class}
+    }
 
-async def generate_website_ultra_fast(project_id: str, prompt: str, project_data: dict):
-    """ULTRA-FAST background task for website generation"""
+async def generate_website_ultra_fast(project_id: str, prompt: str, project_data: dict, checkpoint: Optional[dict] = None,
+                                     save_checkpoint: Optional[Callable[[dict], Awaitable[None]]] = None, resumed: bool = False):
+    """ULTRA-FAST background task for website generation.
+    
+    A checkpoint from an interrupted run skips the phases and stages it already completed. resumed marks a
+    retry of an interrupted run, whose partial outputs are cleared even if no phase was checkpointed.
+    """
+    checkpoint = checkpoint or {}
+    generation_started = time.perf_counter()
+    
+    async def record_checkpoint(fields: dict):
+        checkpoint.update(fields)
+        if save_checkpoint:
+            await save_checkpoint(fields)
+    
     try:
-        phases = ["analysis", "design", "frontend", "backend", "testing", "deployment"]
-        
-        for i, phase in enumerate(phases):
-            # Update current phase
-            progress = int((i / len(phases)) * 75)  # 75% for agent work
-            await db.projects.update_one(
-                {"project_id": project_id},
-                {
-                    "$set": {
-                        "current_phase": phase,
-                        "progress": progress
-                    }
-                }
-            )
+        if checkpoint.get("stage") != "files_generated":
+            completed_phases = list(checkpoint.get("completed_phases", []))
+            if resumed or completed_phases:
+                # Outputs from a partially finished phase are regenerated - left in place they would be duplicated
+                await db.agent_outputs.delete_many({"project_id": project_id, "phase": {"$nin": completed_phases}})
+                logging.info(f"Resuming project {project_id} after phases: {', '.join(completed_phases) or 'none'}")
             
-            # Send phase update
-            await manager.send_update(project_id, {
-                "type": "phase_update",
-                "phase": phase,
-                "progress": progress
-            })
+            async def phase_complete(phase: str):
+                completed_phases.append(phase)
+                await record_checkpoint({"completed_phases": completed_phases})
             
-            # Run agents for this phase (MUCH FASTER)
-            await run_agent_phase(project_id, phase, prompt, project_data)
-        
-        # Generate website files with instant preview (remaining 20%)
-        await db.projects.update_one(
-            {"project_id": project_id},
-            {"$set": {"current_phase": "generating_files", "progress": 80}}
-        )
-        
-        files, preview_html = await generate_instant_website_files(project_id, prompt, project_data)
-        
-        # Send preview update IMMEDIATELY
-        await manager.send_update(project_id, {
-            "type": "preview_ready",
-            "preview_html": preview_html
-        })
+            # Run all 88 agents as a dependency graph (MUCH FASTER)
+            remaining_agents = [agent for agent in AGENTS if agent["phase"] not in completed_phases]
+            with span("agents", project_id):
+                await run_agent_graph(project_id, prompt, project_data, agents=remaining_agents, on_phase_complete=phase_complete)
+                await close_write_buffer(project_id)
+            
+            # Generate website files with instant preview (remaining 20%)
+            await update_project(project_id, {"current_phase": "generating_files", "progress": 80})
+            
+            with span("files", project_id):
+                files, preview_html = await generate_instant_website_files(project_id, prompt, project_data)
+            with span("store_artifacts", project_id):
+                file_manifest, preview_hash = await asyncio.gather(
+                    store_generated_files(files),
+                    blob_store.put(preview_html.encode())
+                )
+            await record_checkpoint({"stage": "files_generated", "file_manifest": file_manifest, "preview_hash": preview_hash})
+        else:
+            file_manifest, preview_hash = checkpoint["file_manifest"], checkpoint["preview_hash"]
+            files, preview_html = await asyncio.gather(
+                load_generated_files(file_manifest),
+                blob_store.get(preview_hash)
+            )
+            preview_html = preview_html.decode()
         
-        # Update with preview
-        await db.projects.update_one(
-            {"project_id": project_id},
-            {"$set": {"preview_html": preview_html, "progress": 90}}
-        )
+        # Store the preview before announcing it - events carry only a reference, so the
+        # HTML is not copied into the event log, the event bus and every since= replay
+        with span("preview_compress", project_id):
+            preview_encodings = await store_preview_encodings(preview_html)
+        await update_project(project_id, {"preview_hash": preview_hash, "preview_encodings": preview_encodings, "progress": 90})
+        preview_ref = {"preview_hash": preview_hash, "preview_url": f"/api/project/{project_id}/preview"}
+        await manager.send_update(project_id, {"type": "preview_ready", **preview_ref})
         
         # Deploy to GitHub (final 10%)
-        await db.projects.update_one(
-            {"project_id": project_id},
-            {"$set": {"current_phase": "deploying", "progress": 95}}
-        )
+        await update_project(project_id, {"current_phase": "deploying", "progress": 95})
         
-        deployment_result = await deploy_to_github_ultra_fast(project_id, files, project_data)
+        with span("deploy", project_id):
+            deployment_result = await deploy_to_github_ultra_fast(project_id, files, project_data)
         
         # Mark as complete
-        await db.projects.update_one(
-            {"project_id": project_id},
-            {
-                "$set": {
-                    "status": "ready",
-                    "progress": 100,
-                    "current_phase": "complete",
-                    "generated_files": files,
-                    "github_repo": deployment_result["github_repo"],
-                    "deployment_url": deployment_result["deployment_url"],
-                    "completed_at": datetime.now(timezone.utc)
-                }
-            }
-        )
+        await update_project(project_id, {
+            "status": "ready",
+            "progress": 100,
+            "current_phase": "complete",
+            "file_manifest": file_manifest,
+            "github_repo": deployment_result["github_repo"],
+            "deployment_url": deployment_result["deployment_url"],
+            "completed_at": datetime.now(timezone.utc)
+        })
         
         # Send completion update
         await manager.send_update(project_id, {
             "type": "generation_complete",
             "github_repo": deployment_result["github_repo"],
             "deployment_url": deployment_result["deployment_url"],
-            "preview_html": preview_html
+            **preview_ref
         })
+        event_log.forget(project_id)
+        record_span("generation", generation_started, project_id, outcome="ready")
+        await save_timeline(project_id)
         
+    except asyncio.CancelledError:
+        # Lease lost or shutting down - the worker that resumes the job owns the project now,
+        # so buffered statuses are dropped rather than flushed over its progress
+        discard_write_buffer(project_id)
+        event_log.forget(project_id)
+        raise
     except Exception as e:
         logging.error(f"Background generation error: {e}")
-        await db.projects.update_one(
-            {"project_id": project_id},
-            {
-                "$set": {
-                    "status": "error",
-                    "error": str(e),
-                    "completed_at": datetime.now(timezone.utc)
-                }
-            }
-        )
+        try:
+            await close_write_buffer(project_id)
+        except Exception as flush_error:
+            logging.error(f"Status flush failed for project {project_id}: {flush_error}")
+        
+        await update_project(project_id, {
+            "status": "error",
+            "error": str(e),
+            "completed_at": datetime.now(timezone.utc)
+        })
         
         await manager.send_update(project_id, {
             "type": "generation_error",
             "error": str(e)
         })
+        event_log.forget(project_id)
+        record_span("generation", generation_started, project_id, outcome="error")
+        await save_timeline(project_id)
+
+async def save_timeline(project_id: str):
+    """Persist a finished project's timeline so any worker can serve it"""
+    timeline = project_timelines.get(project_id)
+    if timeline is None:
+        return
+    try:
+        await update_project(project_id, {"timeline": timeline})
+    except Exception as e:
+        logging.error(f"Failed to save timeline for project {project_id}: {e}")
+
+# Fields left out of status responses unless requested with ?include=
+HEAVY_PROJECT_FIELDS = ("generated_files", "preview_html", "insight_summary", "timeline")
 
 @api_router.get("/project/{project_id}")
-async def get_project_status(project_id: str):
-    """Get project status and progress"""
-    project = await db.projects.find_one({"project_id": project_id})
+async def get_project_status(project_id: str, request: Request, include: Optional[str] = None, since: Optional[int] = None):
+    """Get project status and progress.
+    
+    Heavy fields are only returned when listed in include (comma separated). Responses carry an ETag so
+    unchanged projects cost a 304, and since=<version> returns only the agents changed after that version.
+    """
+    included = sorted(field for field in (include or "").split(",") if field in HEAVY_PROJECT_FIELDS)
+    
+    # Cheap version lookup first - an unchanged project never loads the full document
+    current = await db.projects.find_one({"project_id": project_id}, {"_id": 0, "version": 1})
+    if not current:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    etag = status_etag(current.get("version", 0), included, since)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    projection = {"_id": 0, **{field: 0 for field in HEAVY_PROJECT_FIELDS if field not in included}}
+    project = await db.projects.find_one({"project_id": project_id}, projection)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return project
+    # Artifacts live in the blob store, the project only references them by hash
+    if "generated_files" in included:
+        project["generated_files"] = await project_generated_files(project)
+    if "preview_html" in included:
+        project["preview_html"] = await project_preview_html(project)
+    
+    if since is not None:
+        project["agents"] = {
+            agent_id: agent for agent_id, agent in project.get("agents", {}).items()
+            if agent.get("version", 0) > since
+        }
+        project["since"] = since
+    
+    # The document may have moved on since the version lookup
+    return JSONResponse(jsonable_encoder(project), headers={"ETag": status_etag(project.get("version", 0), included, since)})
+
+def status_etag(version: int, included: List[str], since: Optional[int]) -> str:
+    """ETag for one representation of a project version"""
+    return f'"{version}-{"+".join(included) or "lean"}-{"full" if since is None else since}"'
 
 @api_router.get("/project/{project_id}/preview")
-async def get_project_preview(project_id: str):
-    """Get instant preview of generated website"""
-    project = await db.projects.find_one({"project_id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+async def get_project_preview(project_id: str, request: Request):
+    """Get instant preview of generated website - precompressed, with a strong ETag per encoding"""
+    entry = await load_preview(project_id)
+    if entry is None:
+        return HTMLResponse(
+            "<html><body><h1>🚀 Generation in progress... Preview will appear here!</h1></body></html>",
+            headers={"Cache-Control": "no-store"}
+        )
     
-    preview_html = project.get("preview_html")
-    if not preview_html:
-        return HTMLResponse("<html><body><h1>🚀 Generation in progress... Preview will appear here!</h1></body></html>")
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), entry["bodies"])
+    etag = f'"{entry["hash"]}"' if encoding == "identity" else f'"{entry["hash"]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": PREVIEW_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
     
-    return HTMLResponse(preview_html)
+    return Response(entry["bodies"][encoding], media_type="text/html; charset=utf-8", headers=headers)
 
 @api_router.get("/project/{project_id}/download")
-async def download_project_code(project_id: str):
-    """Download project code as ZIP file"""
-    project = await db.projects.find_one({"project_id": project_id})
-    if not project or not project.get("generated_files"):
+async def download_project_code(project_id: str, request: Request):
+    """Download project code as ZIP file.
+    
+    The archive streams while it is built and is then cached by content hash - repeat downloads get a 304 or
+    the cached bytes, and Range requests can resume an interrupted download.
+    """
+    project = await db.projects.find_one({"project_id": project_id}, {"_id": 0, "file_manifest": 1, "generated_files": 1})
+    if not project or not (project.get("file_manifest") or project.get("generated_files")):
         raise HTTPException(status_code=404, detail="Project not found or not ready")
     
-    # Create ZIP file in memory
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for file_path, content in project["generated_files"].items():
-            zip_file.writestr(file_path, content)
+    key = download_archives.key(project_files_digest(project))
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename=flowforge-{project_id[:8]}.zip"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
     
-    zip_buffer.seek(0)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        range_header = None
     
-    return StreamingResponse(
-        io.BytesIO(zip_buffer.read()),
-        media_type="application/zip",
-        headers={"Content-Disposition": f"attachment; filename=flowforge-{project_id[:8]}.zip"}
-    )
+    async def load_files() -> Dict[str, str]:
+        return await project_generated_files(project)
+    
+    archive = download_archives.get(key)
+    if archive is None:
+        build = download_archives.build(key, load_files)
+        if not range_header:
+            return StreamingResponse(build.stream(), media_type="application/zip", headers=headers)
+        archive = await build.result()
+    
+    if range_header:
+        try:
+            byte_range = parse_byte_range(range_header, len(archive))
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(archive)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                archive[start:end + 1],
+                status_code=206,
+                media_type="application/zip",
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(archive)}"}
+            )
+    
+    return Response(archive, media_type="application/zip", headers=headers)
+
+@api_router.get("/project/{project_id}/timeline")
+async def get_project_timeline(project_id: str):
+    """Where a project's generation time went - every span plus totals per span name"""
+    timeline = project_timelines.get(project_id)
+    if timeline is None:
+        project = await db.projects.find_one({"project_id": project_id}, {"_id": 0, "timeline": 1})
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        timeline = project.get("timeline") or {"spans": [], "dropped": 0}
+    
+    totals: Dict[str, dict] = {}
+    for entry in timeline["spans"]:
+        total = totals.setdefault(entry["span"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        total["count"] += 1
+        total["total_ms"] = round(total["total_ms"] + entry["duration_ms"], 1)
+        total["max_ms"] = max(total["max_ms"], entry["duration_ms"])
+    wall_ms = max((entry["start_ms"] + entry["duration_ms"] for entry in timeline["spans"]), default=0.0)
+    
+    return {"project_id": project_id, "wall_ms": round(wall_ms, 1), "totals": totals, **timeline}
+
+@api_router.get("/project/{project_id}/events")
+async def stream_project_events(project_id: str, request: Request, since: Optional[int] = None):
+    """Server-Sent Events stream of project updates, replaying events after since (or Last-Event-ID) first"""
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    connection = SSEConnection()
+    subscriber = await manager.connect(connection, project_id, since)
+    
+    async def stream():
+        try:
+            while True:
+                text = await connection.receive()
+                if text is None:
+                    break
+                yield format_sse(json.loads(text))
+        finally:
+            manager.disconnect(project_id, subscriber)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @api_router.websocket("/ws/{project_id}")
-async def websocket_endpoint(websocket: WebSocket, project_id: str):
-    """WebSocket endpoint for ULTRA-FAST real-time updates"""
-    await manager.connect(websocket, project_id)
+async def websocket_endpoint(websocket: WebSocket, project_id: str, since: Optional[int] = None):
+    """WebSocket endpoint for ULTRA-FAST real-time updates - since=<seq> replays missed events first"""
+    subscriber = await manager.connect(websocket, project_id, since)
     try:
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            if is_ping_message(message):
+                subscriber.offer({"type": "pong", "timestamp": time.time()})
     except WebSocketDisconnect:
-        manager.disconnect(project_id)
+        manager.disconnect(project_id, subscriber)
+
+def is_ping_message(message: str) -> bool:
+    """Clients may send either a bare "ping" or {"type": "ping"}"""
+    if message == "ping":
+        return True
+    try:
+        return json.loads(message).get("type") == "ping"
+    except (ValueError, AttributeError):
+        return False
+
+@api_router.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    """LLM response cache hit/miss counters"""
+    lookups = sum(llm_cache.stats[counter] for counter in ("memory_hits", "mongo_hits", "misses"))
+    hits = llm_cache.stats["memory_hits"] + llm_cache.stats["mongo_hits"]
+    return {
+        **llm_cache.stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory_entries": len(llm_cache._entries)
+    }
+
+@api_router.get("/llm-governor/stats")
+async def get_llm_governor_stats():
+    """LLM concurrency window, queue depth and queue-wait metrics"""
+    requests_sent = llm_governor.stats["requests"]
+    return {
+        **llm_governor.stats,
+        "concurrency_limit": int(llm_governor.limit),
+        "in_flight": llm_governor.in_flight,
+        "waiting": llm_governor.waiting,
+        "queue_wait_seconds_avg": round(llm_governor.stats["queue_wait_seconds_total"] / requests_sent, 4) if requests_sent else 0.0
+    }
+
+@api_router.get("/write-buffer/stats")
+async def get_write_buffer_stats():
+    """Status updates coalesced by the write-behind buffer"""
+    return {
+        **write_buffer_stats,
+        "saved_writes": write_buffer_stats["updates"] - write_buffer_stats["writes"],
+        "active_buffers": len(write_buffers)
+    }
+
+def prometheus_metric(lines: List[str], name: str, kind: str, help_text: str, value: float):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value:g}"]
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage timings and the stats endpoints above"""
+    lines = span_metrics.render()
+    for counter in ("memory_hits", "mongo_hits", "misses", "bypassed"):
+        prometheus_metric(lines, f"flowforge_llm_cache_{counter}_total", "counter", f"LLM cache {counter.replace('_', ' ')}", llm_cache.stats[counter])
+    for counter in ("requests", "rate_limited", "errors"):
+        prometheus_metric(lines, f"flowforge_llm_{counter}_total", "counter", f"LLM governor {counter.replace('_', ' ')}", llm_governor.stats[counter])
+    prometheus_metric(lines, "flowforge_llm_queue_wait_seconds_total", "counter", "Time LLM requests spent waiting for the governor", llm_governor.stats["queue_wait_seconds_total"])
+    prometheus_metric(lines, "flowforge_llm_queue_wait_seconds_max", "gauge", "Longest LLM governor wait", llm_governor.stats["queue_wait_seconds_max"])
+    prometheus_metric(lines, "flowforge_llm_concurrency_limit", "gauge", "Current AIMD concurrency limit", int(llm_governor.limit))
+    prometheus_metric(lines, "flowforge_llm_in_flight", "gauge", "LLM requests in flight", llm_governor.in_flight)
+    prometheus_metric(lines, "flowforge_llm_waiting", "gauge", "LLM requests waiting for the governor", llm_governor.waiting)
+    for counter, value in write_buffer_stats.items():
+        prometheus_metric(lines, f"flowforge_write_buffer_{counter}_total", "counter", f"Write-behind buffer {counter.replace('_', ' ')}", value)
+    for counter, value in download_archives.stats.items():
+        prometheus_metric(lines, f"flowforge_download_archive_{counter}_total", "counter", f"Download archive {counter.replace('_', ' ')}", value)
+    prometheus_metric(lines, "flowforge_websocket_subscribers", "gauge", "Connected update subscribers",
+                      sum(len(subscribers) for subscribers in manager.active_connections.values()))
+    for counter in ("admitted", "rejected"):
+        prometheus_metric(lines, f"flowforge_generation_{counter}_total", "counter", f"Generation requests {counter} by admission control", job_queue.stats[counter])
+    prometheus_metric(lines, "flowforge_generation_queue_depth", "gauge", "Queued generation jobs",
+                      await job_queue.collection.count_documents({"status": "queued"}))
+    prometheus_metric(lines, "flowforge_generation_seconds_estimate", "gauge", "Moving average generation time used for queue ETAs", job_queue.average_seconds)
+    if loop_monitor.running:
+        prometheus_metric(lines, "flowforge_event_loop_stalls_total", "counter", "Times a callback held the event loop past the blocking threshold", loop_monitor.stalls)
+        prometheus_metric(lines, "flowforge_event_loop_lag_seconds_max", "gauge", "Worst event-loop lag seen", loop_monitor.max_lag)
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@api_router.get("/admin/diagnostics")
+async def get_diagnostics(request: Request, top: int = 10):
+    """Event-loop lag and the call sites that blocked the loop longest (DIAGNOSTICS=true, X-Admin-Token required)"""
+    # Reports contain server stack traces - deny unless a token is configured and matches
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return loop_monitor.report(top)
 
 @api_router.get("/")
 async def root():
@@ -768,6 +3332,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_background_services():
+    if DIAGNOSTICS:
+        loop_monitor.start()
+    await ensure_indexes()
+    await event_bus.start()
+    await job_queue.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await job_queue.stop()
+    await event_bus.stop()
+    await loop_monitor.stop()
+    client.close()
+    if _github_client is not None:
+        await _github_client.close()
\ No newline at end of file
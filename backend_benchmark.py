@@ -0,0 +1,207 @@
+"""Offline end-to-end benchmark for the generation pipeline.
+
+Runs /api/generate -> job queue -> generate_website_ultra_fast in-process against a stub
+LlmChat, a fake GitHub HTTP server and mongomock (or a local Mongo with --mongo-url), and
+reports time-to-first-preview, time-to-complete, Mongo operations per project and event-loop
+lag at each concurrency level. Results are written as JSON for regression tracking.
+
+    python backend_benchmark.py --concurrency 1,10,100 --output benchmark_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from offline_stubs import (
+    CountingDatabase,
+    EventLoopLagMonitor,
+    FakeGitHubServer,
+    LatencyModel,
+    configure_offline_environment,
+    install_stub_llm,
+    summarize,
+    use_database,
+)
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+
+class ProjectRecorder:
+    """WebSocket stand-in subscribed to one project - records when the milestones arrive"""
+
+    def __init__(self, submitted_at):
+        self.submitted_at = submitted_at
+        self.first_preview = None
+        self.completed = None
+        self.failed = False
+        self.messages = 0
+        self.done = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        self.messages += 1
+        elapsed = time.perf_counter() - self.submitted_at
+        if message["type"] in ("preview_chunk", "preview_ready") and self.first_preview is None:
+            self.first_preview = elapsed
+        elif message["type"] in ("generation_complete", "generation_error"):
+            self.completed = elapsed
+            self.failed = message["type"] == "generation_error"
+            self.done.set()
+
+    async def close(self):
+        pass
+
+
+async def open_database(args, level):
+    name = f"flowforge_benchmark_{level}"
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        await client.drop_database(name)
+        return client, client[name]
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("mongomock-motor is not installed - pip install mongomock-motor or pass --mongo-url")
+    client = mongomock_motor.AsyncMongoMockClient()
+    return client, client[name]
+
+
+async def run_level(server, args, concurrency, blob_root, github):
+    client, database = await open_database(args, concurrency)
+    db = CountingDatabase(database)
+    use_database(server, db, Path(blob_root) / f"level-{concurrency}")
+    server.llm_cache._entries.clear()
+    server.job_queue.workers = concurrency
+    # Measure the pipeline at this concurrency, not admission control turning projects away
+    server.job_queue.max_queued = max(server.job_queue.max_queued, concurrency)
+    await server.ensure_indexes()
+    db.counts.clear()
+    github.requests.clear()
+    llm_requests = server.LlmChat.calls["requests"]
+
+    lag = EventLoopLagMonitor(args.lag_interval)
+    lag.start()
+    await server.event_bus.start()
+    await server.job_queue.start()
+
+    # Submit through the ASGI app so requests take the same route as production traffic
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark", timeout=None)
+
+    async def submit(index):
+        submitted_at = time.perf_counter()
+        response = await api.post("/api/generate", json={
+            # Distinct prompts so no project is served from another's LLM cache entries
+            "prompt": f"Benchmark site {concurrency}-{index}: a landing page for a local bakery",
+            "business_type": "bakery",
+            "include_auth": args.include_auth,
+        })
+        response.raise_for_status()
+        recorder = ProjectRecorder(submitted_at)
+        await server.manager.connect(recorder, response.json()["project_id"], since=0)
+        return recorder
+
+    started = time.perf_counter()
+    recorders = await asyncio.gather(*(submit(index) for index in range(concurrency)))
+    await api.aclose()
+    try:
+        await asyncio.wait_for(asyncio.gather(*(recorder.done.wait() for recorder in recorders)), args.timeout)
+    except asyncio.TimeoutError:
+        logging.warning(f"Concurrency {concurrency}: timed out after {args.timeout}s")
+    wall_seconds = time.perf_counter() - started
+
+    await server.job_queue.stop()
+    await server.event_bus.stop()
+    await lag.stop()
+    for project_id in list(server.manager.active_connections):
+        for subscriber in list(server.manager.active_connections.get(project_id, ())):
+            subscriber.close()
+
+    mongo_ops = sum(db.counts.values())
+    completed = [recorder for recorder in recorders if recorder.completed is not None]
+    result = {
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_seconds, 3),
+        "completed": sum(1 for recorder in completed if not recorder.failed),
+        "failed": sum(1 for recorder in completed if recorder.failed),
+        "timed_out": concurrency - len(completed),
+        "throughput_projects_per_minute": round(len(completed) / wall_seconds * 60, 2),
+        "time_to_first_preview_s": summarize([r.first_preview for r in recorders if r.first_preview is not None]),
+        "time_to_complete_s": summarize([r.completed for r in completed]),
+        "mongo_ops_per_project": round(mongo_ops / concurrency, 1),
+        "mongo_ops_by_type": dict(db.counts.most_common()),
+        "llm_requests_per_project": round((server.LlmChat.calls["requests"] - llm_requests) / concurrency, 1),
+        "github_requests_per_project": round(sum(github.requests.values()) / concurrency, 1),
+        "event_loop_lag_s": summarize(lag.samples),
+        "messages_per_project": round(statistics.mean(r.messages for r in recorders), 1),
+    }
+    client.close()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,10,100", help="comma separated concurrent project counts")
+    parser.add_argument("--llm-median", type=float, default=0.4, help="median stub LLM latency in seconds")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="log-normal spread of stub LLM latency")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--github-latency", type=float, default=0.01, help="seconds per fake GitHub request")
+    parser.add_argument("--agent-time-scale", type=float, default=1.0, help="multiplier for simulated agent work time")
+    parser.add_argument("--include-auth", action="store_true", help="also generate the FastAPI backend artifact")
+    parser.add_argument("--mongo-url", help="use this Mongo instead of mongomock")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    github = FakeGitHubServer(latency=args.github_latency).start()
+    blob_root = tempfile.mkdtemp(prefix="flowforge-benchmark-")
+    install_stub_llm(LatencyModel(args.llm_median, args.llm_sigma, args.llm_failure_rate, args.seed))
+    configure_offline_environment(github.url, blob_root, args.mongo_url)
+    import server
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    for agent in server.AGENTS:
+        agent["duration"] = int(agent["duration"] * args.agent_time_scale)
+
+    levels = []
+    for concurrency in (int(value) for value in args.concurrency.split(",")):
+        print(f"Running {concurrency} concurrent project(s)...")
+        result = await run_level(server, args, concurrency, blob_root, github)
+        levels.append(result)
+        preview, complete, lag = result["time_to_first_preview_s"] or {}, result["time_to_complete_s"] or {}, result["event_loop_lag_s"] or {}
+        print(
+            f"  first preview p50/p95/p99 {preview.get('p50')}/{preview.get('p95')}/{preview.get('p99')}s, "
+            f"complete p50/p95/p99 {complete.get('p50')}/{complete.get('p95')}/{complete.get('p99')}s, "
+            f"{result['mongo_ops_per_project']} Mongo ops/project, loop lag p99 {lag.get('p99')}s"
+        )
+
+    if server._github_client is not None:
+        await server._github_client.close()
+    github.stop()
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "verbose")},
+        "levels": levels,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
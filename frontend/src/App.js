@@ -363,21 +363,50 @@ const PhaseSection = ({ phase, agents, activeAgents, currentPhase, completedCoun
   );
 };
 
+// Assemble streamed preview artifacts the same way the backend builds preview_html
+const assemblePreview = ({ html, css, js, jsDone }) => {
+  const body = ['<!DOCTYPE html>', '<html>', '</html>', '<head>', '</head>', '<body>', '</body>']
+    .reduce((content, tag) => content.split(tag).join(''), html);
+  // Scripts only run once complete - a half-streamed script is a syntax error
+  const script = jsDone ? `<script>\n        ${js}\n    </script>` : '';
+  return `<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>
+        ${css}
+    </style>
+</head>
+<body>
+    ${body}
+    ${script}
+</body>
+</html>`;
+};
+
 // Live preview component with insane effects
 const LivePreview = ({ projectId, previewHtml, isGenerating }) => {
   const iframeRef = useRef(null);
+  const hasRenderedRef = useRef(false);
   const [isLoading, setIsLoading] = useState(false);
   
   useEffect(() => {
+    if (!previewHtml) {
+      hasRenderedRef.current = false;
+    }
     if (previewHtml && iframeRef.current) {
-      setIsLoading(true);
+      // Streamed chunks re-render in place - only the first render shows the loader
+      if (!hasRenderedRef.current) {
+        hasRenderedRef.current = true;
+        setIsLoading(true);
+        setTimeout(() => setIsLoading(false), 1000);
+      }
       const iframe = iframeRef.current;
       const doc = iframe.contentDocument || iframe.contentWindow.document;
       doc.open();
       doc.write(previewHtml);
       doc.close();
-      
-      setTimeout(() => setIsLoading(false), 1000);
     }
   }, [previewHtml]);
   
@@ -493,6 +522,9 @@ function App() {
   
   const recognitionRef = useRef(null);
   const wsRef = useRef(null);
+  const previewPartsRef = useRef({ html: '', css: '', js: '', jsDone: false });
+  const lastSeqRef = useRef(0);
+  const generationActiveRef = useRef(false);
 
   // Initialize agents data
   useEffect(() => {
@@ -667,6 +699,9 @@ function App() {
     setProgress(0);
     setCurrentPhase('analysis');
     setPreviewHtml(null);
+    previewPartsRef.current = { html: '', css: '', js: '', jsDone: false };
+    lastSeqRef.current = 0;
+    generationActiveRef.current = true;
     setActiveAgents([]);
     
     // Reset all agents
@@ -690,6 +725,17 @@ function App() {
         }),
       });
 
+      if (response.status === 429) {
+        // Admission control: the generation queue is full
+        const retryAfter = response.headers.get('Retry-After');
+        toast.error('⏳ Generation queue is full', {
+          description: retryAfter ? `Please try again in about ${retryAfter} seconds.` : 'Please try again shortly.'
+        });
+        generationActiveRef.current = false;
+        setIsGenerating(false);
+        return;
+      }
+
       if (!response.ok) {
         throw new Error('Failed to start generation');
       }
@@ -697,22 +743,29 @@ function App() {
       const data = await response.json();
       setCurrentProject(data.project_id);
       
-      // Connect to WebSocket for real-time updates
-      connectWebSocket(data.project_id);
+      // Connect to WebSocket for real-time updates - replay from the start, since a
+      // worker may already have sent the first updates before the handshake finished
+      connectWebSocket(data.project_id, 0);
       
+      const queue = data.queue;
       toast.success('🚀 Website generation started!', {
-        description: `88 AI agents activated! Project ID: ${data.project_id.slice(0, 8)}...`
+        description: queue && queue.position > 1
+          ? `Queued at position ${queue.position}, ready in about ${Math.ceil(queue.eta_seconds / 60)} min. Project ID: ${data.project_id.slice(0, 8)}...`
+          : `88 AI agents activated! Project ID: ${data.project_id.slice(0, 8)}...`
       });
       
     } catch (error) {
       console.error('Generation error:', error);
       toast.error('Failed to start website generation');
+      generationActiveRef.current = false;
       setIsGenerating(false);
     }
   };
 
-  const connectWebSocket = (projectId) => {
-    const wsUrl = `${BACKEND_URL}/api/ws/${projectId}`.replace(/^http/, 'ws');
+  const connectWebSocket = (projectId, since = null) => {
+    // Resume from the last event seen so a dropped connection misses nothing
+    const query = since !== null ? `?since=${since}` : '';
+    const wsUrl = `${BACKEND_URL}/api/ws/${projectId}${query}`.replace(/^http/, 'ws');
     wsRef.current = new WebSocket(wsUrl);
 
     wsRef.current.onopen = () => {
@@ -721,6 +774,9 @@ function App() {
 
     wsRef.current.onmessage = (event) => {
       const data = JSON.parse(event.data);
+      if (data.seq) {
+        lastSeqRef.current = data.seq;
+      }
       
       switch (data.type) {
         case 'agent_update':
@@ -741,14 +797,31 @@ function App() {
           setProgress(data.progress);
           break;
           
+        case 'preview_chunk': {
+          const parts = previewPartsRef.current;
+          parts[data.artifact] = (parts[data.artifact] || '') + (data.delta || '');
+          if (data.artifact === 'js' && data.done) {
+            parts.jsDone = true;
+          }
+          if (parts.html) {
+            setPreviewHtml(assemblePreview(parts));
+          }
+          break;
+        }
+          
         case 'preview_ready':
-          setPreviewHtml(data.preview_html);
+          // Events only reference the stored preview - fetch the finished HTML once
+          fetch(`${BACKEND_URL}${data.preview_url}`)
+            .then(response => response.ok ? response.text() : Promise.reject(new Error(`HTTP ${response.status}`)))
+            .then(html => setPreviewHtml(html))
+            .catch(error => console.error('Preview fetch error:', error));
           toast.success('✨ Live preview ready!', {
             description: 'Your website is being generated in real-time'
           });
           break;
           
         case 'generation_complete':
+          generationActiveRef.current = false;
           setIsGenerating(false);
           setProgress(100);
           setActiveAgents([]);
@@ -762,6 +835,7 @@ function App() {
           break;
           
         case 'generation_error':
+          generationActiveRef.current = false;
           setIsGenerating(false);
           setActiveAgents([]);
           toast.error('💥 Generation failed', {
@@ -773,6 +847,9 @@ function App() {
 
     wsRef.current.onclose = () => {
       console.log('🔌 WebSocket disconnected');
+      if (generationActiveRef.current) {
+        setTimeout(() => connectWebSocket(projectId, lastSeqRef.current), 1000);
+      }
     };
 
     wsRef.current.onerror = (error) => {
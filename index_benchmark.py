@@ -0,0 +1,144 @@
+"""Lookup latency for the project queries before and after the startup index bootstrap.
+
+Seeds a scratch database with synthetic projects and agent outputs, times the hot queries
+(project by id, status version lookup, agent outputs by project) as collection scans, then
+runs server.ensure_indexes() and times them again.
+
+    python index_benchmark.py --projects 1000000 --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from offline_stubs import summarize, use_database
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+def project_document(agents_per_project, phases):
+    now = datetime.now(timezone.utc)
+    return {
+        "project_id": str(uuid.uuid4()),
+        "prompt": "A landing page for a neighbourhood bakery",
+        "status": random.choice(["ready", "ready", "ready", "error", "generating"]),
+        "progress": 100,
+        "current_phase": "complete",
+        "agents": {
+            f"agent_{i:03d}": {"id": f"agent_{i:03d}", "phase": phases[i % len(phases)], "status": "complete", "progress": 100, "version": i}
+            for i in range(agents_per_project)
+        },
+        "version": agents_per_project,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": now,
+    }
+
+
+async def seed(db, phases, projects, agents_per_project, output_projects, batch_size):
+    print(f"Seeding {projects:,} projects...")
+    project_ids = []
+    started = time.perf_counter()
+    for offset in range(0, projects, batch_size):
+        batch = [project_document(agents_per_project, phases) for _ in range(min(batch_size, projects - offset))]
+        project_ids.extend(document["project_id"] for document in batch)
+        await db.projects.insert_many(batch, ordered=False)
+        print(f"  {offset + len(batch):,} projects", end="\r")
+    print(f"  {projects:,} projects in {time.perf_counter() - started:.1f}s")
+
+    print(f"Seeding agent outputs for {output_projects:,} projects...")
+    now = datetime.now(timezone.utc)
+    for project_id in random.sample(project_ids, min(output_projects, len(project_ids))):
+        await db.agent_outputs.insert_many([
+            {"project_id": project_id, "agent_id": f"agent_{i:03d}", "phase": phases[i % len(phases)], "output": "insight " * 40, "timestamp": now}
+            for i in range(88)
+        ], ordered=False)
+    return project_ids
+
+
+async def time_queries(db, project_ids, samples):
+    """Latency of each hot query shape in ms, plus what the planner did for one of them"""
+    queries = {
+        "project_by_id": lambda project_id: db.projects.find_one({"project_id": project_id}, {"_id": 0, "status": 1}),
+        "status_version": lambda project_id: db.projects.find_one({"project_id": project_id}, {"_id": 0, "version": 1}),
+        "agent_outputs_by_phase": lambda project_id: db.agent_outputs.find({"project_id": project_id, "phase": "analysis"}).to_list(None),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for project_id in random.sample(project_ids, min(samples, len(project_ids))):
+            started = time.perf_counter()
+            await query(project_id)
+            timings.append(time.perf_counter() - started)
+        results[name] = summarize(timings, scale=1000)
+
+    plan = await db.projects.find({"project_id": random.choice(project_ids)}).explain()
+    execution = plan.get("executionStats", {})
+    results["project_by_id_plan"] = {
+        "stage": plan["queryPlanner"]["winningPlan"].get("inputStage", plan["queryPlanner"]["winningPlan"]).get("stage"),
+        "docs_examined": execution.get("totalDocsExamined"),
+    }
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--database", default="flowforge_index_benchmark")
+    parser.add_argument("--projects", type=int, default=1_000_000)
+    parser.add_argument("--agents-per-project", type=int, default=8, help="agent entries per project document")
+    parser.add_argument("--output-projects", type=int, default=2_000, help="projects that get 88 agent outputs")
+    parser.add_argument("--scan-samples", type=int, default=20, help="queries timed before indexing (full scans are slow)")
+    parser.add_argument("--samples", type=int, default=2_000, help="queries timed after indexing")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    args = parser.parse_args()
+
+    # server reads its connection settings at import time
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.database
+    import server
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.database)
+    db = client[args.database]
+    use_database(server, db, tempfile.mkdtemp(prefix="flowforge-index-benchmark-"))
+
+    project_ids = await seed(db, server.PHASES, args.projects, args.agents_per_project, args.output_projects, args.batch_size)
+
+    print("Timing queries without indexes...")
+    before = await time_queries(db, project_ids, args.scan_samples)
+
+    print("Running index bootstrap...")
+    started = time.perf_counter()
+    await server.ensure_indexes()
+    bootstrap_seconds = time.perf_counter() - started
+
+    print("Timing queries with indexes...")
+    after = await time_queries(db, project_ids, args.samples)
+
+    results = {
+        "projects": args.projects,
+        "agent_output_projects": args.output_projects,
+        "index_bootstrap_seconds": round(bootstrap_seconds, 2),
+        "without_indexes": before,
+        "with_indexes": after,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    await client.drop_database(args.database)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,263 @@
+"""Concurrent load generator for /api/generate, WebSocket watchers and status polling.
+
+Launches the backend locally in a subprocess (stub LLM, fake GitHub, mongomock unless
+--mongo-url is given), then for each step of the ramp submits N generations at once, attaches
+M WebSocket watchers to every project and polls /api/project/{id} until each finishes. Each step
+reports request latency, delivery lag from send_update to the watcher, dropped connections and
+throughput, and the steps together print as a saturation curve.
+
+    python load_test.py --ramp 1,5,10,25 --watchers 3 --poll-interval 1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+from offline_stubs import summarize
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+
+def serve(args):
+    """Run the backend with offline stand-ins - the child side of the load test"""
+    from offline_stubs import FakeGitHubServer, LatencyModel, configure_offline_environment, install_stub_llm, use_database
+    import uvicorn
+
+    github = FakeGitHubServer(latency=args.github_latency).start()
+    blob_root = tempfile.mkdtemp(prefix="flowforge-load-")
+    install_stub_llm(LatencyModel(args.llm_median, args.llm_sigma, args.llm_failure_rate))
+    configure_offline_environment(github.url, blob_root, args.mongo_url, db_name="flowforge_load_test")
+    import server
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if not args.mongo_url:
+        import mongomock_motor
+        use_database(server, mongomock_motor.AsyncMongoMockClient()["flowforge_load_test"], blob_root)
+    for agent in server.AGENTS:
+        agent["duration"] = int(agent["duration"] * args.agent_time_scale)
+
+    uvicorn.run(server.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+class Watcher:
+    """One WebSocket subscriber - replays from the start, resumes with ?since= after a drop and counts the drop"""
+
+    def __init__(self, ws_url, project_id):
+        self.url = f"{ws_url}/api/ws/{project_id}"
+        self.delivery_lags = []
+        self.drops = 0
+        self.connect_failures = 0
+        # Start from 0 so events sent before the handshake are replayed, not lost
+        self.last_seq = 0
+        self.connected = False
+        self.finished = asyncio.Event()
+
+    async def run(self):
+        while not self.finished.is_set():
+            cursor = self.last_seq
+            try:
+                async with websockets.connect(f"{self.url}?since={cursor}", open_timeout=10, max_size=None) as connection:
+                    self.connected = True
+                    connected_at = time.time()
+                    async for raw in connection:
+                        received_at = time.time()
+                        message = json.loads(raw)
+                        seq = message.get("seq")
+                        if seq is not None and seq <= cursor:
+                            continue  # already seen before the reconnect
+                        # Replayed events were sent before this connection opened - their lag is the
+                        # outage or the handshake, not delivery
+                        if "sent_at" in message and message["sent_at"] >= connected_at:
+                            self.delivery_lags.append(received_at - message["sent_at"])
+                        if seq is not None:
+                            self.last_seq = seq
+                        if message.get("type") in ("generation_complete", "generation_error"):
+                            self.finished.set()
+                            return
+                self.drops += 1
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+                if self.connected:
+                    self.drops += 1
+                else:
+                    self.connect_failures += 1
+                await asyncio.sleep(0.5)
+
+
+async def poll_status(client, project_id, interval, finished, latencies, not_modified):
+    etag = None
+    while not finished.is_set():
+        headers = {"If-None-Match": etag} if etag else {}
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/api/project/{project_id}", headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 304:
+                not_modified.append(1)
+            etag = response.headers.get("etag", etag)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(finished.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_step(args, base_url, projects):
+    ws_url = base_url.replace("http", "ws", 1)
+    submit_latencies, poll_latencies, not_modified, errors = [], [], [], []
+    completion_times = []
+    watchers = []
+
+    limits = httpx.Limits(max_connections=projects * 2 + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        async def one_project(index):
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/generate", json={
+                    "prompt": f"Load test site {projects}-{index}: a portfolio for a photographer",
+                    "business_type": "portfolio",
+                    "include_auth": False,
+                })
+                submit_latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                errors.append(f"generate: {e}")
+                return
+            project_id = response.json()["project_id"]
+
+            project_watchers = [Watcher(ws_url, project_id) for _ in range(args.watchers)]
+            watchers.extend(project_watchers)
+            finished = asyncio.Event()
+
+            async def first_finish():
+                waits = [asyncio.create_task(w.finished.wait()) for w in project_watchers]
+                try:
+                    await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for wait in waits:
+                        wait.cancel()
+                completion_times.append(time.perf_counter() - started)
+                finished.set()
+
+            tasks = [asyncio.create_task(w.run()) for w in project_watchers]
+            tasks.append(asyncio.create_task(poll_status(client, project_id, args.poll_interval, finished, poll_latencies, not_modified)))
+            try:
+                await asyncio.wait_for(first_finish(), args.step_timeout)
+                await asyncio.wait_for(asyncio.gather(*tasks), 30)
+            except asyncio.TimeoutError:
+                errors.append(f"project {project_id} did not finish")
+            finally:
+                finished.set()
+                for task in tasks:
+                    task.cancel()
+
+        step_started = time.perf_counter()
+        await asyncio.gather(*(one_project(index) for index in range(projects)))
+        wall_seconds = time.perf_counter() - step_started
+
+    delivery_lags = [lag for watcher in watchers for lag in watcher.delivery_lags]
+    return {
+        "projects": projects,
+        "watchers": len(watchers),
+        "wall_seconds": round(wall_seconds, 3),
+        "completed": len(completion_times),
+        "throughput_projects_per_minute": round(len(completion_times) / wall_seconds * 60, 2),
+        "generate_latency_s": summarize(submit_latencies),
+        "poll_latency_s": summarize(poll_latencies),
+        "poll_not_modified_ratio": round(len(not_modified) / len(poll_latencies), 3) if poll_latencies else None,
+        "delivery_lag_s": summarize(delivery_lags),
+        "time_to_complete_s": summarize(completion_times),
+        "dropped_connections": sum(watcher.drops for watcher in watchers),
+        "failed_connections": sum(watcher.connect_failures for watcher in watchers),
+        "errors": errors[:20],
+    }
+
+
+def print_curve(steps):
+    print()
+    print(f"{'projects':>8} {'proj/min':>9} {'submit p99':>11} {'poll p99':>9} {'lag p50':>8} {'lag p99':>8} {'done p50':>9} {'drops':>6} {'errors':>7}")
+    for step in steps:
+        print(
+            f"{step['projects']:>8} {step['throughput_projects_per_minute']:>9} "
+            f"{step['generate_latency_s']['p99'] or '-':>11} {step['poll_latency_s']['p99'] or '-':>9} "
+            f"{step['delivery_lag_s']['p50'] or '-':>8} {step['delivery_lag_s']['p99'] or '-':>8} "
+            f"{step['time_to_complete_s']['p50'] or '-':>9} {step['dropped_connections'] + step['failed_connections']:>6} "
+            f"{len(step['errors']):>7}"
+        )
+
+
+async def wait_until_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                sys.exit(f"Backend exited with code {process.returncode}")
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    sys.exit("Backend did not start in time")
+
+
+async def drive(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, __file__, "--serve", "--port", str(args.port),
+               "--llm-median", str(args.llm_median), "--llm-sigma", str(args.llm_sigma),
+               "--llm-failure-rate", str(args.llm_failure_rate), "--github-latency", str(args.github_latency),
+               "--agent-time-scale", str(args.agent_time_scale)]
+    if args.mongo_url:
+        command += ["--mongo-url", args.mongo_url]
+    process = subprocess.Popen(command, cwd=Path(__file__).parent, env={**os.environ})
+    try:
+        await wait_until_ready(base_url, process)
+        steps = []
+        for projects in (int(value) for value in args.ramp.split(",")):
+            print(f"Ramp step: {projects} concurrent generation(s) x {args.watchers} watcher(s)...")
+            steps.append(await run_step(args, base_url, projects))
+        print_curve(steps)
+        if args.output:
+            Path(args.output).write_text(json.dumps({"config": vars(args), "steps": steps}, indent=2))
+            print(f"\nResults written to {args.output}")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ramp", default="1,5,10,25", help="comma separated concurrent generation counts")
+    parser.add_argument("--watchers", type=int, default=3, help="WebSocket watchers per project")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between status polls per project")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-median", type=float, default=0.4)
+    parser.add_argument("--llm-sigma", type=float, default=0.5)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--github-latency", type=float, default=0.01)
+    parser.add_argument("--agent-time-scale", type=float, default=1.0)
+    parser.add_argument("--mongo-url", help="use this Mongo instead of mongomock")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--step-timeout", type=float, default=600)
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+        asyncio.run(drive(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""Local stand-ins for the services the backend talks to, so it can be exercised fully offline.
+
+Used by backend_benchmark.py, load_test.py, index_benchmark.py and the tests. Everything here must be set
+up before `server` is imported: install_stub_llm() replaces the LlmChat integration and
+configure_offline_environment() points the GitHub client, blob store and event bus at local resources.
+The scripts also share use_database() and the summarize() reporting helper.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+class LatencyModel:
+    """Log-normal LLM latency with an optional failure rate, deterministic per request key"""
+
+    def __init__(self, median=0.5, sigma=0.5, failure_rate=0.0, seed=0):
+        self.median = median
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+    def _random(self, key):
+        digest = hashlib.sha256(f"{self.seed}:{key}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def sample(self, key):
+        """(latency in seconds, whether the call fails) for one request"""
+        rng = self._random(key)
+        return self.median * rng.lognormvariate(0, self.sigma), rng.random() < self.failure_rate
+
+
+def stub_response(session_id, text):
+    """Deterministic, plausibly shaped output for each kind of prompt the backend sends"""
+    digest = hashlib.sha256(f"{session_id}:{text}".encode()).hexdigest()[:8]
+    if session_id.endswith("_html"):
+        return f"<main>\n  <h1>Generated site {digest}</h1>\n  <section class=\"hero\"><p>{text[:120]}</p></section>\n</main>"
+    if session_id.endswith("_css"):
+        return f"/* {digest} */\nbody {{ margin: 0; font-family: system-ui, sans-serif; }}\n.hero {{ padding: 4rem 2rem; }}"
+    if session_id.endswith("_js"):
+        return f"// {digest}\ndocument.querySelectorAll('a').forEach((link) => link.addEventListener('click', () => {{}}));"
+    if session_id.endswith("_backend"):
+        return f"# {digest}\nfrom fastapi import FastAPI\n\napp = FastAPI()\n"
+    return (
+        f"Insight {digest}: focus the page on one clear call to action for the target audience. "
+        "Keep the layout mobile-first with fast loading images. "
+        "Use consistent brand colours and readable typography."
+    )
+
+
+def install_stub_llm(latency: LatencyModel):
+    """Register a stub emergentintegrations.llm.chat module whose LlmChat sleeps instead of calling a model"""
+
+    class UserMessage:
+        def __init__(self, text):
+            self.text = text
+
+    class LlmChat:
+        calls = Counter()
+
+        def __init__(self, api_key=None, session_id="", system_message=""):
+            self.session_id = session_id
+            self.system_message = system_message
+
+        def with_model(self, provider, model):
+            self.model = (provider, model)
+            return self
+
+        async def send_message(self, message):
+            LlmChat.calls["requests"] += 1
+            LlmChat.calls[self.session_id] += 1
+            # Keyed by session and attempt, so a run is reproducible however calls interleave
+            delay, failed = latency.sample(f"{self.session_id}:{LlmChat.calls[self.session_id]}")
+            await asyncio.sleep(delay)
+            if failed:
+                LlmChat.calls["failures"] += 1
+                raise RuntimeError("503 stub LLM unavailable")
+            return stub_response(self.session_id, message.text)
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = LlmChat
+    chat.UserMessage = UserMessage
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.chat = chat
+    package = types.ModuleType("emergentintegrations")
+    package.llm = llm
+    sys.modules.update({
+        "emergentintegrations": package,
+        "emergentintegrations.llm": llm,
+        "emergentintegrations.llm.chat": chat,
+    })
+    return LlmChat
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """Just enough of the GitHub REST API for deploy_to_github_ultra_fast"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _count(self):
+        with self.server.lock:
+            self.server.requests[f"{self.command} {self.path.split('/')[-1] if '/git/' in self.path else self.path}"] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return self._fault()
+
+    def _fault(self):
+        """Answer with an injected error if one is queued for this path - True if it was sent"""
+        with self.server.lock:
+            for index, (suffix, status, headers) in enumerate(self.server.faults):
+                if self.path.endswith(suffix):
+                    del self.server.faults[index]
+                    break
+            else:
+                return False
+        self._send(status, {"message": "Injected failure"}, headers)
+        return True
+
+    def do_GET(self):
+        if self._count():
+            return
+        if "/git/ref/heads/" in self.path:
+            return self._send(200, {"object": {"sha": "head"}})
+        if "/git/commits/" in self.path:
+            return self._send(200, {"tree": {"sha": "base-tree"}})
+        self._send(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        body = self._body()
+        if self._count():
+            return
+        if self.path == "/user/repos":
+            return self._send(201, {
+                "html_url": f"https://github.com/offline/{body['name']}",
+                "full_name": f"offline/{body['name']}",
+                "owner": {"login": "offline"},
+                "default_branch": "main",
+            })
+        if self.path.endswith("/git/blobs"):
+            return self._send(201, {"sha": hashlib.sha1(body["content"].encode()).hexdigest()})
+        if self.path.endswith("/git/trees"):
+            return self._send(201, {"sha": hashlib.sha1(json.dumps(body["tree"]).encode()).hexdigest()})
+        if self.path.endswith("/git/commits"):
+            return self._send(201, {"sha": hashlib.sha1(json.dumps(body).encode()).hexdigest()})
+        if self.path.endswith("/pages"):
+            return self._send(201, {})
+        self._send(404, {"message": "Not Found"})
+
+    def do_PATCH(self):
+        self._body()
+        if self._count():
+            return
+        self._send(200, {})
+
+
+class FakeGitHubServer:
+    def __init__(self, latency=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHubHandler)
+        self.httpd.requests = Counter()
+        self.httpd.lock = threading.Lock()
+        self.httpd.latency = latency
+        self.httpd.faults = []
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def fail_next(self, path_suffix, status=502, headers=None):
+        """Answer the next request whose path ends with path_suffix with status instead"""
+        with self.httpd.lock:
+            self.httpd.faults.append((path_suffix, status, headers or {}))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def configure_offline_environment(github_url, blob_path, mongo_url=None, db_name="flowforge_offline"):
+    """Environment for importing server offline - set before import, since server reads config at import time"""
+    os.environ.update({
+        "MONGO_URL": mongo_url or "mongodb://127.0.0.1:27017",
+        "DB_NAME": db_name,
+        "GITHUB_API_URL": github_url,
+        "GITHUB_TOKEN": "offline-token",
+        "GEMINI_API_KEY": "",
+        "EMERGENT_LLM_KEY": "offline-key",
+        "EVENT_BUS": "local",
+        "BLOB_STORE": "filesystem",
+        "BLOB_STORE_PATH": str(Path(blob_path)),
+    })
+    # The stub LLM has no provider quota - measure our pipeline, not the rate limit.
+    # Export these to run against production limits instead.
+    os.environ.setdefault("LLM_REQUESTS_PER_SECOND", "100000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", "512")
+
+
+def use_database(server, database, blob_root):
+    """Point every collection reference the server holds at database, and blobs at a local directory"""
+    server.db = database
+    server.llm_cache.collection = database.llm_cache
+    server.job_queue.collection = database.generation_jobs
+    server.event_log.collection = database.project_events
+    server.blob_store = server.FileSystemBlobStore(Path(blob_root))
+
+
+# Collection methods that each cost at least one round trip
+MONGO_OPERATIONS = {
+    "find", "find_one", "find_one_and_update", "insert_one", "insert_many", "update_one", "update_many",
+    "delete_one", "delete_many", "count_documents", "aggregate", "create_index", "index_information",
+}
+
+
+class CountingCollection:
+    """Collection proxy that counts operations by name"""
+
+    def __init__(self, collection, counts):
+        self._collection = collection
+        self._counts = counts
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in MONGO_OPERATIONS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self._counts[name] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    """Database proxy whose collections count their operations in one shared Counter"""
+
+    def __init__(self, database):
+        self._database = database
+        self.counts = Counter()
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self.counts)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._database, name)
+        if hasattr(attribute, "find_one"):
+            return CountingCollection(attribute, self.counts)
+        return attribute
+
+
+class EventLoopLagMonitor:
+    """Samples how late a periodic timer fires - the time the loop was blocked or saturated"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, scale=1.0):
+    """Count, p50/p95/p99, max and mean of samples, each multiplied by scale (1000 turns seconds into ms)"""
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(sample * scale for sample in samples)
+    return {
+        "count": len(ordered),
+        "p50": round(percentile(ordered, 0.50), 4),
+        "p95": round(percentile(ordered, 0.95), 4),
+        "p99": round(percentile(ordered, 0.99), 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.mean(ordered), 4),
+    }
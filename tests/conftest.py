@@ -0,0 +1,35 @@
+"""Import the backend offline: stub LlmChat, no real GitHub, local blob store and mongomock.
+
+server reads its configuration at import time, so everything here runs before any test module imports it.
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "backend")]
+
+from offline_stubs import FakeGitHubServer, LatencyModel, configure_offline_environment, install_stub_llm, use_database  # noqa: E402
+
+install_stub_llm(LatencyModel(median=0.0, sigma=0.0))
+configure_offline_environment("http://127.0.0.1:9", tempfile.mkdtemp(prefix="flowforge-tests-"), db_name="flowforge_tests")
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh mongomock database wired into every collection reference the server holds"""
+    import mongomock_motor
+    database = mongomock_motor.AsyncMongoMockClient()["flowforge_tests"]
+    use_database(server, database, tmp_path / "blobs")
+    return database
+
+
+@pytest.fixture
+def github():
+    fake = FakeGitHubServer().start()
+    yield fake
+    fake.stop()
@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.fixture
+def queue(database, monkeypatch):
+    monkeypatch.setattr(server.job_queue, "max_queued", 2)
+    monkeypatch.setattr(server.job_queue, "average_seconds", 60.0)
+    monkeypatch.setattr(server.job_queue, "workers", 2)
+    monkeypatch.setattr(server, "PAID_API_KEYS", {"paid-key"})
+    return server.job_queue
+
+
+def submit(*requests):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await client.post("/api/generate", json={"prompt": "A bakery", **body}, headers=headers)
+                    for body, headers in requests]
+
+    return asyncio.run(scenario())
+
+
+FREE = ({}, {})
+PAID = ({"priority": "paid"}, {"X-Api-Key": "paid-key"})
+
+
+def test_full_queue_answers_429_with_retry_after(queue):
+    first, second, third = submit(FREE, FREE, FREE)
+
+    assert first.json()["queue"] == {"position": 1, "eta_seconds": 60, "priority": "free"}
+    assert second.json()["queue"]["position"] == 2
+    assert third.status_code == 429
+    assert third.headers["retry-after"] == "30"
+
+
+def test_free_backlog_does_not_turn_paid_work_away(queue):
+    *_, paid = submit(FREE, FREE, PAID)
+
+    assert paid.status_code == 200
+    assert paid.json()["queue"]["position"] == 1
+
+
+def test_paid_priority_needs_a_listed_api_key(queue):
+    no_key, wrong_key, unknown = submit(({"priority": "paid"}, {}), ({"priority": "paid"}, {"X-Api-Key": "nope"}),
+                                        ({"priority": "vip"}, {}))
+
+    assert no_key.status_code == 403
+    assert wrong_key.status_code == 403
+    assert unknown.status_code == 400
+
+
+def test_paid_jobs_are_claimed_first(queue):
+    free, paid = submit(FREE, PAID)
+
+    async def claim_order():
+        return [(await queue.claim())["project_id"] for _ in range(2)]
+
+    assert asyncio.run(claim_order()) == [paid.json()["project_id"], free.json()["project_id"]]
@@ -0,0 +1,49 @@
+import asyncio
+import gc
+import io
+import zipfile
+
+import server
+
+
+def test_build_completes_after_every_client_lets_go():
+    async def scenario():
+        cache = server.ArchiveCache()
+        release = asyncio.Event()
+
+        async def load_files():
+            await release.wait()
+            return {"index.html": "<html></html>"}
+
+        build = cache.build("key-1", load_files)
+        task = build.task
+        del build
+        gc.collect()
+
+        # Nothing outside the cache references the build while it waits
+        release.set()
+        await task
+        archive = cache.get("key-1")
+        assert zipfile.ZipFile(io.BytesIO(archive)).read("index.html") == b"<html></html>"
+        assert cache._building == {}
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_downloads_share_one_build():
+    async def scenario():
+        cache = server.ArchiveCache()
+
+        async def load_files():
+            await asyncio.sleep(0)
+            return {"a.txt": "a"}
+
+        first = cache.build("key-1", load_files)
+        second = cache.build("key-1", load_files)
+
+        assert first is second
+        assert await first.result() == await second.result()
+        assert cache.stats["builds"] == 1
+        assert cache.stats["shared_builds"] == 1
+
+    asyncio.run(scenario())
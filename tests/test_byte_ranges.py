@@ -0,0 +1,85 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-19", (10, 19)),
+    ("bytes=990-", (990, 999)),  # open-ended
+    ("bytes=-100", (900, 999)),  # suffix
+    ("bytes=-5000", (0, 999)),  # suffix longer than the body
+    ("bytes=900-5000", (900, 999)),  # end past the end is clamped
+    ("bytes=0-9, 20-29", None),  # multiple ranges - whole body
+    ("bytes=5-3", None),  # last before first is invalid, so ignored
+    ("items=0-9", None),
+    ("bytes=-", None),
+])
+def test_parse_byte_range(header, expected):
+    assert server.parse_byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-2000", "bytes=-0"])
+def test_unsatisfiable_ranges_raise(header):
+    with pytest.raises(ValueError):
+        server.parse_byte_range(header, 1000)
+
+
+def test_any_range_of_an_empty_body_is_unsatisfiable():
+    with pytest.raises(ValueError):
+        server.parse_byte_range("bytes=-10", 0)
+
+
+@pytest.fixture
+def project(database):
+    files = {"index.html": "<h1>Range test</h1>" * 200, "styles.css": "body { margin: 0; }"}
+    asyncio.run(database.projects.insert_one({"project_id": "range-project", "status": "ready", "generated_files": files}))
+    return "range-project"
+
+
+def download(project_id, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(f"/api/project/{project_id}/download", headers=headers or {})
+
+    return asyncio.run(scenario())
+
+
+def test_download_serves_ranges(project):
+    full = download(project)
+    assert full.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(full.content)).namelist() == ["index.html", "styles.css"]
+    etag, size = full.headers["etag"], len(full.content)
+
+    partial = download(project, {"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == full.content[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{size}"
+
+    suffix = download(project, {"Range": "bytes=-16", "If-Range": etag})
+    assert suffix.status_code == 206
+    assert suffix.content == full.content[-16:]
+
+
+def test_download_ignores_invalid_and_stale_ranges(project):
+    full = download(project)
+
+    assert download(project, {"Range": "bytes=5-3"}).status_code == 200
+    stale = download(project, {"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == full.content
+
+
+def test_download_past_the_end_is_416(project):
+    size = len(download(project).content)
+
+    response = download(project, {"Range": f"bytes={size}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{size}"
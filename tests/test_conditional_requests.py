@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+@pytest.fixture
+def project(database):
+    asyncio.run(database.projects.insert_one({"project_id": "etag-project", "status": "generating", "version": 3, "agents": {}}))
+    return "etag-project"
+
+
+def get(path, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers=headers or {})
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    "W/{etag}",
+    '"stale", {etag}',
+    "*",
+])
+def test_status_honours_if_none_match_forms(project, if_none_match):
+    etag = get(f"/api/project/{project}").headers["etag"]
+
+    response = get(f"/api/project/{project}", {"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_status_with_stale_etag_is_served(project):
+    response = get(f"/api/project/{project}", {"If-None-Match": '"2-lean-full"'})
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 3
+
+
+def test_etag_matches():
+    assert server.etag_matches('W/"a", "b"', '"b"')
+    assert server.etag_matches("*", '"b"')
+    assert not server.etag_matches('"a"', '"b"')
+    assert not server.etag_matches(None, '"b"')
@@ -0,0 +1,82 @@
+import asyncio
+
+import server
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_disconnect_last_subscriber_removes_project():
+    async def scenario():
+        manager = server.ConnectionManager()
+        websocket = FakeWebSocket()
+        subscriber = await manager.connect(websocket, "project-1")
+
+        # close() re-enters disconnect through on_close - the outer call must not fail
+        manager.disconnect("project-1", subscriber)
+        await asyncio.sleep(0)
+
+        assert "project-1" not in manager.active_connections
+        assert subscriber.closed
+        assert websocket.closed
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_closing_itself_removes_project():
+    async def scenario():
+        manager = server.ConnectionManager()
+        subscriber = await manager.connect(FakeWebSocket(), "project-1")
+
+        subscriber.close()
+        manager.disconnect("project-1", subscriber)
+        await asyncio.sleep(0)
+
+        assert manager.active_connections == {}
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_keeps_other_subscribers():
+    async def scenario():
+        manager = server.ConnectionManager()
+        first = await manager.connect(FakeWebSocket(), "project-1")
+        second = await manager.connect(FakeWebSocket(), "project-1")
+
+        manager.disconnect("project-1", first)
+        await asyncio.sleep(0)
+
+        assert manager.active_connections["project-1"] == {second}
+        manager.disconnect("project-1", second)
+        assert "project-1" not in manager.active_connections
+
+    asyncio.run(scenario())
+
+
+def test_close_keeps_the_websocket_close_task():
+    async def scenario():
+        manager = server.ConnectionManager()
+        websocket = FakeWebSocket()
+        subscriber = await manager.connect(websocket, "project-1")
+
+        subscriber.close()
+        close_task = subscriber._close_task
+        subscriber.close()
+
+        assert subscriber._close_task is close_task
+        await close_task
+        assert websocket.closed
+
+    asyncio.run(scenario())
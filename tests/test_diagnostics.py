@@ -0,0 +1,37 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+def get_diagnostics(headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/admin/diagnostics", headers=headers or {})
+
+    return asyncio.run(scenario())
+
+
+def test_diagnostics_denied_without_configured_token(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+
+    assert get_diagnostics().status_code == 403
+    assert get_diagnostics({"X-Admin-Token": ""}).status_code == 403
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({}, 403),
+    ({"X-Admin-Token": "wrong"}, 403),
+    ({"X-Admin-Token": "secret"}, 200),
+])
+def test_diagnostics_requires_matching_token(monkeypatch, headers, status):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+
+    response = get_diagnostics(headers)
+
+    assert response.status_code == status
+    if status == 200:
+        assert response.json()["enabled"] is False
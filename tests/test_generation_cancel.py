@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import server
+
+
+def test_cancelled_generation_discards_buffered_statuses(database):
+    async def scenario():
+        project_id = "cancelled-project"
+        await database.projects.insert_one({"project_id": project_id, "status": "generating", "agents": {}, "version": 0})
+        generation = asyncio.create_task(server.generate_website_ultra_fast(project_id, "A bakery landing page", {"project_id": project_id}))
+
+        for _ in range(200):
+            if project_id in server.write_buffers and server.write_buffers[project_id]._pending:
+                break
+            await asyncio.sleep(0.01)
+        write_buffer = server.write_buffers[project_id]
+
+        generation.cancel()
+        await asyncio.gather(generation, return_exceptions=True)
+        assert project_id not in server.write_buffers
+        assert write_buffer._pending == {}
+
+        # A stale flush timer would still write agent statuses after the interval
+        snapshot = await database.projects.find_one({"project_id": project_id}, {"_id": 0})
+        await asyncio.sleep(server.AGENT_STATUS_FLUSH_INTERVAL * 2)
+        assert await database.projects.find_one({"project_id": project_id}, {"_id": 0}) == snapshot
+
+    asyncio.run(scenario())
+
+
+def test_resumed_generation_clears_partial_outputs(database, github, monkeypatch):
+    for agent in server.AGENTS:
+        monkeypatch.setitem(agent, "duration", 0)
+    monkeypatch.setattr(server, "_github_client", server.GitHubClient(os.environ["GITHUB_TOKEN"], base_url=github.url))
+    project_id = "resumed-project"
+    analysis_agents = [agent for agent in server.AGENTS if agent["phase"] == "analysis"][:3]
+
+    async def scenario():
+        await database.projects.insert_one({"project_id": project_id, "status": "generating", "agents": {}, "version": 0})
+        # The crashed attempt wrote some outputs but never checkpointed a completed phase
+        await database.agent_outputs.insert_many([
+            {"project_id": project_id, "agent_id": agent["id"], "phase": agent["phase"], "output": "stale"}
+            for agent in analysis_agents
+        ])
+        await server.generate_website_ultra_fast(project_id, "A bakery landing page", {"project_id": project_id},
+                                                 checkpoint={}, resumed=True)
+        outputs = await database.agent_outputs.find({"project_id": project_id}).to_list(None)
+        await server._github_client.close()
+        return outputs
+
+    outputs = asyncio.run(scenario())
+    agent_ids = [output["agent_id"] for output in outputs]
+    assert len(agent_ids) == len(set(agent_ids)) == len(server.AGENTS)
+    assert all(output["output"] != "stale" for output in outputs)
+
+
+def test_job_queue_marks_retried_jobs_as_resumed(database, monkeypatch):
+    calls = []
+
+    async def fake_generation(*args, **kwargs):
+        calls.append(kwargs["resumed"])
+
+    monkeypatch.setattr(server, "generate_website_ultra_fast", fake_generation)
+    job = {"job_id": "job", "project_id": "job", "prompt": "x", "project_data": {}, "checkpoint": {}}
+
+    async def scenario():
+        await server.job_queue._run({**job, "attempts": 1})
+        await server.job_queue._run({**job, "attempts": 2})
+
+    asyncio.run(scenario())
+    assert calls == [False, True]
@@ -0,0 +1,34 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+import server
+
+
+def test_preview_events_reference_the_stored_preview(database, github, monkeypatch):
+    for agent in server.AGENTS:
+        monkeypatch.setitem(agent, "duration", 0)
+    monkeypatch.setattr(server, "_github_client", server.GitHubClient(os.environ["GITHUB_TOKEN"], base_url=github.url))
+    project_id = "events-project"
+
+    async def scenario():
+        await database.projects.insert_one({"project_id": project_id, "status": "generating", "agents": {}, "version": 0})
+        await server.generate_website_ultra_fast(project_id, "A bakery landing page", {"project_id": project_id, "title": "Bakery"})
+        logged = await database.project_events.find({"project_id": project_id}).sort("seq", 1).to_list(None)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            preview = await client.get(f"/api/project/{project_id}/preview")
+        await server._github_client.close()
+        return [document["event"] for document in logged], preview
+
+    events, preview = asyncio.run(scenario())
+    by_type = {event["type"]: event for event in events}
+
+    assert "generation_complete" in by_type
+    assert not any("preview_html" in json.dumps(event, default=str) for event in events)
+    ready = by_type["preview_ready"]
+    assert ready["preview_url"] == f"/api/project/{project_id}/preview"
+    assert preview.status_code == 200
+    assert server.blob_hash(preview.content) == ready["preview_hash"]
@@ -0,0 +1,141 @@
+import asyncio
+import email.utils
+import time
+
+import httpx
+import pytest
+
+import server
+
+FILES = {f"page-{index}.html": f"<p>page {index}</p>" for index in range(5)}
+
+
+def push(github, files=FILES):
+    async def scenario():
+        client = server.GitHubClient("offline-token", base_url=github.url, max_backoff=5)
+        try:
+            return await server.push_files_to_github(client, "offline/site", "main", files, "Add site")
+        finally:
+            await client.close()
+
+    return asyncio.run(scenario())
+
+
+def test_push_is_one_commit(github):
+    commit_sha = push(github)
+
+    assert commit_sha
+    assert github.requests["POST blobs"] == len(FILES)
+    assert github.requests["POST trees"] == 1
+    assert github.requests["POST commits"] == 1
+    assert github.requests["PATCH main"] == 1
+
+
+def test_push_retries_server_errors(github):
+    github.fail_next("/git/trees", 502)
+    github.fail_next("/git/refs/heads/main", 503)
+
+    push(github)
+
+    assert github.requests["POST blobs"] == len(FILES)
+    assert github.requests["POST trees"] == 2
+    assert github.requests["POST commits"] == 1
+    assert github.requests["PATCH main"] == 2
+
+
+def test_push_honours_retry_after(github):
+    github.fail_next("/git/blobs", 429, {"Retry-After": "1"})
+
+    started = time.monotonic()
+    push(github)
+
+    assert time.monotonic() - started >= 1
+    assert github.requests["POST blobs"] == len(FILES) + 1
+    assert github.requests["POST trees"] == 1
+
+
+def test_push_gives_up_after_max_retries(github):
+    for _ in range(server.GITHUB_MAX_RETRIES + 1):
+        github.fail_next("/git/commits", 500)
+
+    with pytest.raises(Exception, match="Failed to create commit"):
+        push(github)
+    assert github.requests["POST commits"] == server.GITHUB_MAX_RETRIES + 1
+    assert github.requests["PATCH main"] == 0
+
+
+def test_push_honours_http_date_retry_after(github):
+    github.fail_next("/git/blobs", 429, {"Retry-After": email.utils.formatdate(time.time() + 2, usegmt=True)})
+
+    started = time.monotonic()
+    push(github)
+
+    assert time.monotonic() - started >= 0.5
+    assert github.requests["POST blobs"] == len(FILES) + 1
+
+
+def test_repository_create_is_not_retried_on_server_errors(github):
+    github.fail_next("/user/repos", 502)
+
+    async def scenario():
+        client = server.GitHubClient("offline-token", base_url=github.url, max_backoff=5)
+        try:
+            return await client.request("POST", "/user/repos", json={"name": "site"})
+        finally:
+            await client.close()
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 502
+    assert github.requests["POST /user/repos"] == 1
+
+
+def test_non_idempotent_requests_retry_connection_failures(monkeypatch):
+    monkeypatch.setattr(server.random, "uniform", lambda low, high: 0.0)
+    attempts = []
+
+    def refuse(request):
+        attempts.append(request.method)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def scenario():
+        client = server.GitHubClient("offline-token", max_backoff=5)
+        client._client = httpx.AsyncClient(base_url="http://github.test", transport=httpx.MockTransport(refuse))
+        try:
+            await client.request("POST", "/user/repos", json={"name": "site"})
+        finally:
+            await client.close()
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(scenario())
+    assert len(attempts) == server.GITHUB_MAX_RETRIES + 1
+
+
+def test_non_idempotent_requests_do_not_retry_read_timeouts():
+    attempts = []
+
+    def time_out(request):
+        attempts.append(request.method)
+        raise httpx.ReadTimeout("read timed out", request=request)
+
+    async def scenario():
+        client = server.GitHubClient("offline-token", max_backoff=5)
+        client._client = httpx.AsyncClient(base_url="http://github.test", transport=httpx.MockTransport(time_out))
+        try:
+            await client.request("POST", "/user/repos", json={"name": "site"})
+        finally:
+            await client.close()
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(scenario())
+    assert attempts == ["POST"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("-1", 0.0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),  # in the past
+    ("soon", None),
+    (None, None),
+])
+def test_parse_retry_after(value, expected):
+    assert server.parse_retry_after(value) == expected
@@ -0,0 +1,45 @@
+import asyncio
+
+import server
+from offline_stubs import CountingDatabase, use_database
+
+
+def seed(database, project_id, outputs):
+    return database.agent_outputs.insert_many([
+        {"project_id": project_id, "agent_id": f"agent_{index:03d}", "phase": "analysis",
+         "output": f"Insight {index}: lead with one clear call to action for busy parents."}
+        for index in range(outputs)
+    ])
+
+
+def test_cached_summary_skips_loading_outputs(database, tmp_path):
+    counted = CountingDatabase(database)
+    use_database(server, counted, tmp_path / "blobs")
+
+    async def scenario():
+        await database.projects.insert_one({"project_id": "insight-project"})
+        await seed(database, "insight-project", 3)
+        first = await server.get_insight_summary("insight-project")
+        counted.counts.clear()
+        return first, await server.get_insight_summary("insight-project")
+
+    first, second = asyncio.run(scenario())
+    assert second == first
+    assert counted.counts["find"] == 0
+    assert counted.counts["update_one"] == 0
+
+
+def test_new_outputs_invalidate_the_summary(database):
+    async def scenario():
+        await database.projects.insert_one({"project_id": "insight-project"})
+        await seed(database, "insight-project", 2)
+        await server.get_insight_summary("insight-project")
+        await database.agent_outputs.insert_one({"project_id": "insight-project", "agent_id": "agent_099", "phase": "design",
+                                                 "output": "Use a warm palette with generous whitespace around photos."})
+        await server.get_insight_summary("insight-project")
+        project = await database.projects.find_one({"project_id": "insight-project"})
+        return project["insight_summary"]
+
+    cached = asyncio.run(scenario())
+    assert cached["outputs"] == 3
+    assert "warm palette" in cached["text"]
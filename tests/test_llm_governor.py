@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    # Retry sleeps scale a jittered backoff - zero jitter retries immediately
+    monkeypatch.setattr(server.random, "uniform", lambda low, high: 0.0)
+
+
+def governor(**kwargs):
+    options = {"max_concurrency": 16, "min_concurrency": 2, "requests_per_second": 1000, "tokens_per_minute": 60_000}
+    return server.LLMGovernor(**{**options, **kwargs})
+
+
+def test_bucket_acquire_consumes_tokens():
+    async def scenario():
+        bucket = server.TokenBucket(rate_per_second=1e-9, capacity=10)
+        await bucket.acquire(4)
+        return bucket.tokens
+
+    assert asyncio.run(scenario()) == pytest.approx(6)
+
+
+def test_bucket_acquire_waits_for_refill():
+    async def scenario():
+        bucket = server.TokenBucket(rate_per_second=20, capacity=1)
+        await bucket.acquire(1)
+        started = time.monotonic()
+        await bucket.acquire(1)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.04
+
+
+def test_bucket_adjust_charges_and_refunds():
+    bucket = server.TokenBucket(rate_per_second=1e-9, capacity=100)
+    bucket.adjust(30)
+    assert bucket.tokens == pytest.approx(70)
+    bucket.adjust(150)
+    assert bucket.tokens == pytest.approx(-80)
+    bucket.adjust(-50)
+    assert bucket.tokens == pytest.approx(-30)
+    # Refunds never overfill the bucket
+    bucket.adjust(-1000)
+    assert bucket.tokens == pytest.approx(100)
+
+
+def test_window_halves_at_most_once_per_second():
+    limiter = governor()
+    for _ in range(5):
+        limiter._decrease()
+    assert limiter.limit == 8
+
+    limiter._last_decrease -= 1.0
+    limiter._decrease()
+    assert limiter.limit == 4
+
+    for _ in range(3):
+        limiter._last_decrease -= 1.0
+        limiter._decrease()
+    assert limiter.limit == limiter.min_concurrency
+
+
+def test_window_grows_additively():
+    limiter = governor()
+    limiter.limit = 4.0
+    for _ in range(4):
+        limiter._increase()
+    # About one slot per window of successes
+    assert 4.9 < limiter.limit < 5.0
+
+    limiter.limit = 15.99
+    limiter._increase()
+    assert limiter.limit == limiter.max_concurrency
+
+
+def test_call_refunds_unused_output_tokens():
+    async def scenario():
+        limiter = governor()
+
+        async def send():
+            return "ok"
+
+        response = await limiter.call(send, estimated_tokens=1000)
+        return limiter, response
+
+    limiter, response = asyncio.run(scenario())
+    assert response == "ok"
+    # 1000 charged up front, then the expected output allowance refunded down to the actual 1 token
+    expected = 60_000 - 1000 - (server.estimate_tokens("ok") - server.LLM_EXPECTED_OUTPUT_TOKENS)
+    assert limiter.tokens.tokens == pytest.approx(expected, abs=50)
+    assert limiter.in_flight == 0
+
+
+def test_call_retries_rate_limits_then_succeeds(no_backoff):
+    attempts = []
+
+    async def scenario():
+        limiter = governor()
+
+        async def send():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("429 Too Many Requests")
+            return "ok"
+
+        return limiter, await limiter.call(send, estimated_tokens=10)
+
+    limiter, response = asyncio.run(scenario())
+    assert response == "ok"
+    assert len(attempts) == 2
+    assert limiter.stats["rate_limited"] == 1
+    assert limiter.limit == pytest.approx(8 + 1 / 8)
+
+
+def test_call_raises_after_rate_limit_retries(no_backoff):
+    attempts = []
+
+    async def scenario():
+        limiter = governor()
+
+        async def send():
+            attempts.append(1)
+            raise RuntimeError("RESOURCE_EXHAUSTED: quota exceeded")
+
+        with pytest.raises(RuntimeError):
+            await limiter.call(send, estimated_tokens=10)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert len(attempts) == server.LLM_RATE_LIMIT_RETRIES + 1
+    assert limiter.stats["rate_limited"] == server.LLM_RATE_LIMIT_RETRIES + 1
+    assert limiter.in_flight == 0
+    # Retries land within the same second, so the window only halved once
+    assert limiter.limit == 8
+
+
+def test_call_does_not_retry_other_errors(no_backoff):
+    attempts = []
+
+    async def scenario():
+        limiter = governor()
+
+        async def send():
+            attempts.append(1)
+            raise ValueError("malformed prompt")
+
+        with pytest.raises(ValueError):
+            await limiter.call(send, estimated_tokens=10)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert len(attempts) == 1
+    assert limiter.stats["errors"] == 1
+    assert limiter.stats["rate_limited"] == 0
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def latency(monkeypatch):
+    tracker = server.LatencyTracker()
+    monkeypatch.setattr(server, "llm_latency", tracker)
+    return tracker
+
+
+def call(hedge):
+    async def send():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    return asyncio.run(server.call_llm(send, estimated_tokens=10, hedge=hedge))
+
+
+def test_hedgeable_calls_record_latency(latency):
+    assert call(hedge=True) == "ok"
+    assert len(latency.samples) == 1
+    assert latency.samples[0] >= 0.01
+
+
+def test_unhedged_calls_leave_the_window_alone(latency):
+    assert call(hedge=False) == "ok"
+    assert len(latency.samples) == 0
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(server.random, "uniform", lambda low, high: 0.0)
+
+
+def flaky_send(attempts):
+    async def send():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise TimeoutError("socket read timed out")
+        return "ok"
+
+    return send
+
+
+def test_timeout_inside_send_is_retried_without_deadline(no_backoff):
+    attempts = []
+
+    assert asyncio.run(server.call_llm(flaky_send(attempts), estimated_tokens=10)) == "ok"
+    assert len(attempts) == 2
+
+
+def test_timeout_inside_send_is_retried_within_deadline(no_backoff):
+    attempts = []
+
+    assert asyncio.run(server.call_llm(flaky_send(attempts), estimated_tokens=10, deadline=45)) == "ok"
+    assert len(attempts) == 2
+
+
+def test_expired_deadline_is_reported(no_backoff):
+    async def send():
+        await asyncio.sleep(1)
+        return "late"
+
+    with pytest.raises(TimeoutError, match="exceeded its 0.05s deadline"):
+        asyncio.run(server.call_llm(send, estimated_tokens=10, deadline=0.05))
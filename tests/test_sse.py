@@ -0,0 +1,32 @@
+import asyncio
+import json
+
+import server
+
+
+def test_close_ends_the_stream_while_the_slot_is_full():
+    async def scenario():
+        connection = server.SSEConnection()
+        await connection.send_text(json.dumps({"type": "agent_update"}))
+        # A slow subscriber is closed while its send is still parked on the full slot
+        blocked_send = asyncio.create_task(connection.send_text(json.dumps({"type": "phase_update"})))
+        await asyncio.sleep(0)
+        await connection.close()
+        blocked_send.cancel()
+        return await asyncio.wait_for(connection.receive(), 1)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_receive_returns_messages_until_closed():
+    async def scenario():
+        connection = server.SSEConnection()
+        await connection.send_text("first")
+        received = [await connection.receive()]
+        waiting = asyncio.create_task(connection.receive())
+        await asyncio.sleep(0)
+        await connection.close()
+        received.append(await asyncio.wait_for(waiting, 1))
+        return received
+
+    assert asyncio.run(scenario()) == ["first", None]